@@ -1,156 +1,490 @@
-import json
+import time
+
+# Cold start is reported phase by phase (see report_startup) #
+STARTED = time.perf_counter()
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
 
 from kivy.config import Config
 Config.set('graphics', 'width', '360')
 Config.set('graphics', 'height', '800')
 
 from kivy.app import App
+from kivy.clock import Clock
 
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.floatlayout import FloatLayout
+from kivy.uix.relativelayout import RelativeLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.popup import Popup
-from kivy.uix.textinput import TextInput
 from kivy.uix.widget import Widget
 
+# Popup and TextInput are only needed by the dialogs, so they are #
+# imported when a dialog is first built, not at startup           #
+
 from kivy.uix.recycleview import RecycleView
 from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recyclelayout import RecycleLayout
 
-from kivy.graphics import Color, Rectangle
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, Mesh, Rectangle
 from kivy.graphics import Color, RoundedRectangle
+from kivy.metrics import sp
 
-from kivy.properties import StringProperty
+from kivy.logger import Logger
 from kivy.properties import NumericProperty
 
-from datetime import datetime
+from budget_engine import (
+    CATEGORIES, BudgetLimits, Ledger, budget_rows, build_rows, compute_view,
+    format_cents, month_bounds, month_totals, order_key, parse_query, to_cents, to_micros
+)
+
+IMPORTED = time.perf_counter()
+
+ROW_HEIGHT = 70
+
+# With lazy storage, older entries load once the list is scrolled to #
+# within this many rows of its end #
+LOAD_AHEAD_ROWS = 10
+
+# Ledgers with this many entries have their rows rebuilt off the UI #
+# thread, then published a slice at a time, for at most FRAME_BUDGET #
+# seconds per frame (half a frame at 60 fps)                         #
+BACKGROUND_ROWS = 5000
+PUBLISH_CHUNK = 1000
+FRAME_BUDGET = 1 / 120
+
+def dimmed(color):
+    return [c * 0.7 for c in color[:3]] + [color[3]]
+
+## CANVAS HELPERS ##
+
+# (text, font size) -> texture, for text drawn over and over, such as #
+# row captions and month names; rendered once for every widget        #
+captions = {}
+
+def render_text(text, font_size=15):
+    label = CoreLabel(text=text, font_size=sp(font_size))
+    label.refresh()
+    return label.texture
+
+def caption(text, font_size=15):
+    key = (text, font_size)
+    if key not in captions:
+        captions[key] = render_text(text, font_size)
+    return captions[key]
+
+# Sets mesh to one quad per (x, y, width, height) in rects, so any #
+# number of same-colored boxes is a single canvas instruction      #
+
+def mesh_rects(mesh, rects):
+    vertices = []
+    indices = []
+
+    for i, (x, y, w, h) in enumerate(rects):
+        vertices += [x, y, 0, 0, x + w, y, 0, 0, x + w, y + h, 0, 0, x, y + h, 0, 0]
+        n = i * 4
+        indices += [n, n + 1, n + 2, n + 2, n + 3, n]
+
+    mesh.vertices = vertices
+    mesh.indices = indices
+
+## TRANSACTION ROW ##
 
-class EntryRow(FloatLayout):
-    timestamp_text = StringProperty("")
-    category_text = StringProperty("")
-    amount_text = StringProperty("")
-    index = NumericProperty(0)
+# Rows are created and refreshed while the list scrolls, so each one   #
+# is kept light: two Labels at fixed sizes in local coordinates        #
+# (moving the row moves nothing), and the category and the Edit and X  #
+# buttons drawn on the canvas from caption textures shared by every    #
+# row, with button touches hit-tested here.                            #
 
+class EntryRow(RecycleDataViewBehavior, RelativeLayout):
     bg_color = (0.30, 0.45, 0.32, 1)
+    edit_color = (0.3, 0.5, 0.8, 1)
+    delete_color = (0.8, 0.3, 0.3, 1)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.size_hint_y = None
-        self.height = 70
+        self.entry_id = 0
+        self.pressed = None
 
         with self.canvas.before:
             Color(*self.bg_color)
-            self.bg_rect = RoundedRectangle(
-                radius=[10], 
-                pos=self.pos, 
-                size=self.size
-            )
+            self.bg_rect = RoundedRectangle(radius=[10], pos=(5, 5))
 
-        self.bind(pos=self.update_rect, size=self.update_rect)
+        ## TIMESTAMP (TOP-LEFT) AND AMOUNT (TOP-RIGHT) ##
 
-        ## TIMESTAMP (TOP-LEFT) ##
+        self.timestamp_label = Label(size_hint=(None, None), pos=(0, 42), size=(180, 30))
+        self.amount_label = Label(size_hint=(None, None), pos=(0, 42), size=(100, 30))
+        self.add_widget(self.timestamp_label)
+        self.add_widget(self.amount_label)
 
-        self.timestamp_label = Label(
-            text="",
-            size_hint=(None, None),
-            size=(180, 30),
-            pos_hint={"x": 0.00, "y": 0.60},
-            halign="left",
-            valign="middle"
-        )
-        self.timestamp_label.bind(size=lambda inst, val: setattr(inst, "text_size", inst.size))
-        self.bind(timestamp_text=self.timestamp_label.setter("text"))
+        ## CATEGORY (BOTTOM-LEFT), EDIT (BOTTOM-RIGHT), DELETE (FAR RIGHT) ##
 
-        ## CATEGORY (BOTTOM-LEFT) ##
+        with self.canvas.after:
+            self.edit_bg = Color(*self.edit_color)
+            self.edit_rect = Rectangle(size=(60, 30))
+            self.delete_bg = Color(*self.delete_color)
+            self.delete_rect = Rectangle(size=(40, 30))
 
-        self.category_label = Label(
-            text="",
-            size_hint=(None, None),
-            size=(180, 30),
-            pos_hint={"x": 0.00, "y": 0.20},
-            halign="left",
-            valign="middle"
-        )
-        self.category_label.bind(size=lambda inst, val: setattr(inst, "text_size", inst.size))
-        self.bind(category_text=self.category_label.setter("text"))
+            Color(1, 1, 1, 1)
+            self.category_text = Rectangle()
+            self.edit_text = Rectangle()
+            self.delete_text = Rectangle()
 
-        ## AMOUNT (TOP-RIGHT) ##
+        self.set_caption(self.category_text, "", (0, 14, 180, 30))
 
-        self.amount_label = Label(
-            text="",
-            size_hint=(None, None),
-            size=(100, 30),
-            pos_hint={"right": 0.95, "y": 0.60},
-            halign="right",
-            valign="middle"
-        )
-        self.amount_label.bind(size=lambda inst, val: setattr(inst, "text_size", inst.size))
-        self.bind(amount_text=self.amount_label.setter("text"))
+        # Sizing last: on_size places everything that depends on width #
+        self.size_hint_y = None
+        self.height = ROW_HEIGHT
+
+    # Draws text's shared texture centered in box (x, y, width, height) #
+
+    def set_caption(self, rect, text, box):
+        x, y, w, h = box
+        texture = caption(text) if text else None
+        tw, th = texture.size if texture is not None else (0, 0)
+
+        rect.texture = texture
+        rect.size = (tw, th)
+        rect.pos = (int(x + (w - tw) / 2), int(y + (h - th) / 2))
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.entry_id = data["entry_id"]
+        self.timestamp_label.text = data["timestamp_text"]
+        self.amount_label.text = data["amount_text"]
+        self.set_caption(self.category_text, data["category_text"], (0, 14, 180, 30))
+
+    def on_size(self, instance, size):
+        width, height = size
+        self.bg_rect.size = (width - 2, height - 2)
+        self.amount_label.x = width * 0.95 - 100
+
+        self.edit_rect.pos = (width * 0.95 - 60, 14)
+        self.delete_rect.pos = (width * 0.80 - 40, 14)
+        self.set_caption(self.edit_text, "Edit", (*self.edit_rect.pos, 60, 30))
+        self.set_caption(self.delete_text, "X", (*self.delete_rect.pos, 40, 30))
+
+    ## BUTTON TOUCHES ##
+
+    def button_at(self, touch):
+        x, y = self.to_local(*touch.pos)
+
+        for name, rect in (("edit", self.edit_rect), ("delete", self.delete_rect)):
+            left, bottom = rect.pos
+            w, h = rect.size
+            if left <= x <= left + w and bottom <= y <= bottom + h:
+                return name
+        return None
+
+    def press(self, name):
+        self.pressed = name
+
+        # Darkened while held, like the Buttons these replace #
+        self.edit_bg.rgba = dimmed(self.edit_color) if name == "edit" else self.edit_color
+        self.delete_bg.rgba = dimmed(self.delete_color) if name == "delete" else self.delete_color
+
+    def on_touch_down(self, touch):
+        if self.collide_point(*touch.pos):
+            name = self.button_at(touch)
+            if name is not None:
+                touch.grab(self)
+                self.press(name)
+                return True
+        return super().on_touch_down(touch)
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+
+        touch.ungrab(self)
+        name = self.pressed
+        self.press(None)
+
+        if name is not None and name == self.button_at(touch):
+            if name == "edit":
+                self.on_edit_pressed()
+            else:
+                self.on_delete_pressed()
+        return True
+
+    def on_delete_pressed(self):
+        App.get_running_app().delete_entry(self.entry_id)
+
+    def on_edit_pressed(self):
+        app = App.get_running_app()
+        app.open_edit_window(self.entry_id)
+
+## FIXED-HEIGHT ROW LAYOUT ##
+
+# Every row is ROW_HEIGHT tall, so a row's position follows from its #
+# index: view options are worked out on demand instead of stored and #
+# laid out per row, and finding the rows in view (on every scroll)   #
+# is arithmetic instead of RecycleBoxLayout's scan of every position. #
+# Rows fill the width, with no padding or spacing.                    #
+
+class FixedRows:
+    def __init__(self, layout, count=0):
+        self.layout = layout
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        layout = self.layout
+        row_height = layout.row_height
+
+        return {
+            "size": [layout.width, row_height],
+            "size_hint": [1, None],
+            "size_hint_min": [None, None],
+            "size_hint_max": [None, None],
+            "pos": [layout.x, layout.top - (index + 1) * row_height],
+            "pos_hint": {},
+            "viewclass": layout.viewclass,
+            "width_none": False,
+            "height_none": False
+        }
 
-        ## EDIT BUTTON (BOTTON-RIGHT) ##
+class FixedRowLayout(RecycleBoxLayout):
+    row_height = NumericProperty(ROW_HEIGHT)
 
-        self.edit_btn = Button(
-            text="Edit",
-            size_hint=(None, None),
-            size=(60, 30),
-            pos_hint={"right": 0.95, "y": 0.20},
-            background_normal="",
-            background_color=(0.3, 0.5, 0.8, 1),
-            color=(1, 1, 1, 1)
-        )
-        self.edit_btn.bind(on_release=self.on_edit_pressed)
+    def compute_sizes_from_data(self, data, flags):
+        self.clear_layout()
+        self.view_opts = FixedRows(self, len(data))
 
-        ## DELETE BUTTON (FAR RIGHT) ##
+    def compute_layout(self, data, flags):
+        RecycleLayout.compute_layout(self, data, flags)
+        if self._changed_views is None:
+            return
 
-        self.delete_btn = Button(
-            text="X",
-            size_hint=(None, None),
-            size=(40, 30),
-            pos_hint={"right": 0.80, "y": 0.20},
-            background_normal="",
-            background_color=(0.8, 0.3, 0.3, 1),
-            color=(1, 1, 1, 1)
-        )
-        self.delete_btn.bind(on_release=self.on_delete_pressed)
-    
-        self.add_widget(self.timestamp_label)
-        self.add_widget(self.category_label)
-        self.add_widget(self.amount_label)
-        self.add_widget(self.edit_btn)
-        self.add_widget(self.delete_btn)
+        self.clear_layout()
+        self.minimum_size = (0, len(data) * self.row_height)
 
-    def update_rect(self, *args):
-        self.bg_rect.pos = (self.x + 5, self.y + 5)
-        self.bg_rect.size = (self.width - 2, self.height - 2)
+    # Index of the row at y, in layout coordinates #
 
-    def on_delete_pressed(self, instance):
-        App.get_running_app().delete_entry(self.index)
+    def get_view_index_at(self, pos):
+        count = len(self.view_opts)
+        index = int((self.top - pos[1]) // self.row_height)
+        return min(max(index, 0), max(count - 1, 0))
 
-    def on_edit_pressed(self, instance):
-        app = App.get_running_app()
-        app.open_edit_window(self.index)
+    def compute_visible_views(self, data, viewport):
+        if not data:
+            return []
 
-class BudgetApp(App):
-    def build(self):
+        x, y, w, h = viewport
+        return list(range(
+            self.get_view_index_at((x, y + h)),
+            self.get_view_index_at((x, y)) + 1
+        ))
 
-        self.saved_amounts = []
+    # scroll_y that brings row index to the top of rv #
 
-        # Load saved entries from file #
-        try:
-            with open("data.json", "r") as f:
-                content = f.read().strip()
-                if content:
-                    self.saved_amounts = json.loads(content)
-
-                    # Convert timestamp strings back to datetime objects #
-                    for entry in self.saved_amounts:
-                        if isinstance(entry.get("timestamp"), str):
-                            entry["timestamp"] = datetime.fromisoformat(entry["timestamp"])
+    def scroll_y_for(self, rv, index):
+        hidden = len(self.view_opts) * self.row_height - rv.height
+        if hidden <= 0:
+            return 1
+        return min(max(1 - index * self.row_height / hidden, 0), 1)
+
+## BUDGET VIEW ##
+
+# The budget window's category bars and month chart. Each draws its   #
+# boxes as one Mesh per color and its text as textures, so redrawing   #
+# sets a few meshes instead of building a widget per bar or per month. #
+
+class CategoryBars(Widget):
+    row_height = 40
+    track_color = (0.30, 0.45, 0.32, 1)
+    fill_color = (0.51765, 0.878, 0.737, 1)
+    over_color = (0.8, 0.3, 0.3, 1)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rows = []
+
+        with self.canvas:
+            Color(*self.track_color)
+            self.tracks = Mesh(mode="triangles")
+            Color(*self.fill_color)
+            self.fills = Mesh(mode="triangles")
+            Color(*self.over_color)
+            self.overs = Mesh(mode="triangles")
+
+        self.bind(pos=self.redraw, size=self.redraw)
+
+    # rows are (category, cents, limit cents or None), from budget_rows() #
+
+    def show(self, rows):
+        self.rows = rows
+        self.height = len(rows) * self.row_height
+        self.redraw()
+
+    def redraw(self, *args):
+        tracks, fills, overs = [], [], []
+        self.canvas.after.clear()
+
+        with self.canvas.after:
+            Color(1, 1, 1, 1)
+
+            for i, (category, cents, limit) in enumerate(self.rows):
+                bottom = self.y + self.height - (i + 1) * self.row_height
+                bar = (self.x + 5, bottom + 4, self.width - 10, 6)
+
+                # Spending against the limit; a full red bar once over it #
+                if limit:
+                    tracks.append(bar)
+                    share = min(cents / limit, 1) if cents > 0 else 0
+                    (overs if cents > limit else fills).append((*bar[:2], bar[2] * share, bar[3]))
+                    amount = f"${format_cents(cents)} / ${format_cents(limit)}"
                 else:
-                    self.saved_amounts = []
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.saved_amounts = []
+                    amount = f"${format_cents(cents)}"
+
+                name = caption(category or "Uncategorized")
+                Rectangle(texture=name, size=name.size, pos=(int(self.x + 5), int(bottom + 12)))
+
+                text = render_text(amount)
+                Rectangle(texture=text, size=text.size, pos=(int(self.x + self.width - 5 - text.width), int(bottom + 12)))
+
+        mesh_rects(self.tracks, tracks)
+        mesh_rects(self.fills, fills)
+        mesh_rects(self.overs, overs)
+
+    ## ROW TOUCHES ##
+
+    def category_at(self, touch):
+        index = int((self.top - touch.y) // self.row_height)
+        if 0 <= index < len(self.rows):
+            return self.rows[index][0]
+        return False
+
+    def on_touch_down(self, touch):
+        if self.collide_point(*touch.pos) and self.category_at(touch) is not False:
+            touch.grab(self)
+            touch.ud["budget_category"] = self.category_at(touch)
+            return True
+        return super().on_touch_down(touch)
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+
+        touch.ungrab(self)
+        if self.collide_point(*touch.pos) and self.category_at(touch) == touch.ud["budget_category"]:
+            App.get_running_app().open_limit_window(touch.ud["budget_category"])
+        return True
+
+class MonthChart(Widget):
+    bar_color = (0.51765, 0.878, 0.737, 1)
+
+    # Room below the bars for month names, and above for the peak #
+    caption_height = 22
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.months = []
+
+        with self.canvas:
+            Color(*self.bar_color)
+            self.bars = Mesh(mode="triangles")
+
+        self.bind(pos=self.redraw, size=self.redraw)
+
+    # months are (first day of month, cents), from month_totals() #
+
+    def show(self, months):
+        self.months = months
+        self.redraw()
+
+    def redraw(self, *args):
+        self.canvas.after.clear()
+        if not self.months:
+            mesh_rects(self.bars, [])
+            return
+
+        peak = max(cents for month, cents in self.months)
+        slot = self.width / len(self.months)
+        bottom = self.y + self.caption_height
+        room = max(self.height - 2 * self.caption_height, 0)
+
+        bars = []
+        with self.canvas.after:
+            Color(1, 1, 1, 1)
+
+            for i, (month, cents) in enumerate(self.months):
+                left = self.x + i * slot
+                if peak > 0 and cents > 0:
+                    bars.append((left + slot * 0.2, bottom, slot * 0.6, room * cents / peak))
+
+                name = caption(month.strftime("%b"), 11)
+                Rectangle(texture=name, size=name.size, pos=(int(left + (slot - name.width) / 2), int(self.y + 4)))
+
+            text = render_text(f"Peak ${format_cents(peak)}", 11)
+            Rectangle(texture=text, size=text.size, pos=(int(self.x), int(self.y + self.height - text.height)))
+
+        mesh_rects(self.bars, bars)
+
+    ## MONTH TOUCHES ##
+
+    def month_at(self, touch):
+        if not self.months:
+            return None
+
+        index = int((touch.x - self.x) // (self.width / len(self.months)))
+        if 0 <= index < len(self.months):
+            return self.months[index][0]
+        return None
+
+    def on_touch_down(self, touch):
+        if self.collide_point(*touch.pos) and self.month_at(touch) is not None:
+            touch.grab(self)
+            touch.ud["chart_month"] = self.month_at(touch)
+            return True
+        return super().on_touch_down(touch)
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+
+        touch.ungrab(self)
+        if self.collide_point(*touch.pos) and self.month_at(touch) == touch.ud["chart_month"]:
+            App.get_running_app().jump_to_month(touch.ud["chart_month"])
+        return True
+
+class BudgetApp(App):
+    def build(self):
+        self.build_started = time.perf_counter()
+
+        # Dialogs, built on first use (see DIALOGS) #
+        self.popup = None
+        # The Add window's, which the category window may be picking for #
+        self.category_btn = None
+        self.category_popup = None
+        self.edit_window = None
+        self.error_popup = None
+        self.budget_window = None
+        self.limit_window = None
+
+        # Filter typed above the list, and the keys of the entries it #
+        # shows, newest first (see FILTER)                             #
+        self.query = None
+        self.shown_keys = None
+        self.filter_trigger = Clock.create_trigger(self.apply_filter)
+        self.refilter_trigger = Clock.create_trigger(lambda dt: self.update_display())
+
+        # Background row rebuilds (see BACKGROUND ROW BUILDING) #
+        self.pending_version = None
+        self.publishing = None
+        self.publish_event = None
+        # Rows for entries loaded while a rebuild runs, put after its rows #
+        self.streamed = []
+
+        # Load the newest page now and the rest between frames #
+        self.ledger = Ledger()
+        self.loader = self.ledger.stream()
+        next(self.loader, None)
+        self.data_loaded = time.perf_counter()
 
         root = BoxLayout(orientation="vertical")
 
@@ -188,14 +522,22 @@ class BudgetApp(App):
         
         main = FloatLayout()
 
+        # Holds the filter field, added after the first frame (see FILTER) #
+        self.filter_bar = BoxLayout(
+            size_hint=(1, None),
+            height=40,
+            padding=(5, 2),
+            pos_hint={"top": 0.984}
+        )
+        main.add_widget(self.filter_bar)
+
         self.rv = RecycleView(
-            size_hint=(1, 0.7),
-            pos_hint={"center_y": 0.63}
+            size_hint=(1, 0.644),
+            pos_hint={"center_y": 0.602}
         )   
 
-        layout = RecycleBoxLayout(
-            default_size=(None, None),
-            default_size_hint=(1, None),
+        layout = FixedRowLayout(
+            row_height=ROW_HEIGHT,
             size_hint=(1, None),
             orientation='vertical'
         )
@@ -295,7 +637,8 @@ class BudgetApp(App):
             background_color = (0.51765, 0.878, 0.737, 1),
             color = (0, 0, 0, 1),
             size_hint=(1, None),
-            height=91
+            height=91,
+            on_release=self.open_budget_window
         )
 
         # Center text #
@@ -312,11 +655,38 @@ class BudgetApp(App):
         
         self.update_display()
 
+        if self.ledger.store.lazy:
+            # Older months load only as the list is scrolled back to them #
+            self.load_trigger = Clock.create_trigger(self.load_if_near_end)
+            self.rv.bind(scroll_y=self.load_trigger, height=self.load_trigger)
+            self.load_trigger()
+        else:
+            Clock.schedule_interval(self.load_next_chunk, 0)
+
+        self.built = time.perf_counter()
         return root
 
-    ## ADD TRANSACTION WINDOW - METHOD ##
+    ## DIALOGS ##
+
+    # Each dialog is built the first time it is opened and kept, so later #
+    # opens only reset its fields instead of building a new widget tree.  #
+
+    ## ADD TRANSACTION WINDOW - METHODS ##
     
     def open_transaction_window(self, instance):
+        if self.popup is None:
+            self.build_transaction_window()
+
+        self.input_box.text = ""
+        self.category_btn.text = "Select Category"
+        self.selected_category = None
+
+        self.popup.open()
+
+    def build_transaction_window(self):
+        from kivy.uix.popup import Popup
+        from kivy.uix.textinput import TextInput
+
         layout = BoxLayout(orientation="vertical", padding=10, spacing=10)
 
         self.input_box = TextInput(
@@ -340,18 +710,25 @@ class BudgetApp(App):
             content=layout,
             size_hint=(0.8, 0.3)
         )
-        self.popup.open()
 
-    ## CATEGORY SELECTION WINDOW - METHOD ##
+    ## CATEGORY SELECTION WINDOW - METHODS ##
 
-    def open_category_window(self):
-        layout = BoxLayout(orientation="vertical", padding=10, spacing=10)
+    # target is the button that shows the choice: the Add window's, or #
+    # the Edit window's when called from there                          #
 
-        categories = ["Food", "Bills", "Entertainment", "Subscriptions", 
-                      "Rent","Insurance", "Savings", "Medicine", "Therapy", 
-                      "Credit Card", "Personal Care/Hygiene", "Other"]
+    def open_category_window(self, target=None):
+        if self.category_popup is None:
+            self.build_category_window()
 
-        for cat in categories:
+        self.category_target = target if target is not None else self.category_btn
+        self.category_popup.open()
+
+    def build_category_window(self):
+        from kivy.uix.popup import Popup
+
+        layout = BoxLayout(orientation="vertical", padding=10, spacing=10)
+
+        for cat in CATEGORIES:
             btn = Button(text=cat, size_hint_y=None, height=40)
             btn.bind(on_release=lambda instance, c=cat: self.select_category(c))
             layout.add_widget(btn)
@@ -361,19 +738,14 @@ class BudgetApp(App):
             content=layout,
             size_hint=(0.8, 0.84)
         )
-        self.category_popup.open()
 
     ## CATEGORY SELECTION - METHOD ##
 
     def select_category(self, category):
-        self.selected_category = category
-        
-        if hasattr(self, "editing_category_btn"):
-            self.editing_category_btn.text = category
-            del self.editing_category_btn
-            del self.editing_index
-        else:
-            self.category_btn.text = category
+        self.category_target.text = category
+
+        if self.category_target is self.category_btn:
+            self.selected_category = category
         
         self.category_popup.dismiss()
         
@@ -388,59 +760,66 @@ class BudgetApp(App):
             self.show_error("Please enter a valid number.")
             return
 
-        entry = {
-            "amount": amount,
-            "timestamp": datetime.now(),
-            "category": getattr(self, "selected_category", None)
-        }
-
-        self.saved_amounts.append(entry)
+        entry = self.ledger.add(amount, getattr(self, "selected_category", None))
 
-        with open("data.json", "w") as f:
-            json.dump(self.saved_amounts, f, default=str)
-
-        self.update_display()
+        self.insert_row(entry)
         self.popup.dismiss()
 
     ## DELETE ENTRY - METHOD ##
 
-    def delete_entry(self, index):
-        if 0 <= index < len(self.saved_amounts):
-            del self.saved_amounts[index]
+    def delete_entry(self, entry_id):
+        if entry_id not in self.ledger:
+            return
 
-            with open("data.json", "w") as f:
-                json.dump(self.saved_amounts, f, default=str)
-            
-            self.update_display()
+        position = self.ledger.position(entry_id)
+        self.ledger.delete(entry_id)
+        self.remove_row(position)
+
+    ## EDIT ENTRY WINDOW - METHODS ##
+
+    def open_edit_window(self, entry_id):
+        entry = self.ledger.get(entry_id)
+        if entry is None:
+            return
+
+        if self.edit_window is None:
+            self.build_edit_window()
 
-    ## EDIT ENTRY WINDOW - METHOD ##
+        self.editing_id = entry_id
+        self.edit_amount_input.text = str(entry.amount)
+        self.edit_category_btn.text = entry.category or "Uncategorized"
+
+        self.edit_window.open()
+
+    def build_edit_window(self):
+        from kivy.uix.popup import Popup
+        from kivy.uix.textinput import TextInput
 
-    def open_edit_window(self, index):
-        entry = self.saved_amounts[index]
         layout = BoxLayout(orientation="vertical", padding=10, spacing=10)
 
-        amount_input = TextInput(
-            text=str(entry["amount"]),
+        self.edit_amount_input = TextInput(
             multiline=False,
             input_filter="float",
             size_hint_y=None,
             height=40
         )
 
-        category_btn = Button(text=entry.get("category") or "Uncategorized", size_hint=(1, 0.3))
-        category_btn.bind(on_release=lambda inst: self.open_category_window_for_edit(index, category_btn))
+        self.edit_category_btn = Button(size_hint=(1, 0.3))
+        self.edit_category_btn.bind(
+            on_release=lambda inst: self.open_category_window(self.edit_category_btn)
+        )
 
         save_btn = Button(text="Save", size_hint=(1, 0.3))
         save_btn.bind(
             on_release=lambda inst: self.save_edit(
-                index, 
-                amount_input.text,
-                category_btn.text
+                self.editing_id,
+                self.edit_amount_input.text,
+                self.edit_category_btn.text
             )
         )
 
-        layout.add_widget(amount_input)
-        layout.add_widget(category_btn)
+        layout.add_widget(self.edit_amount_input)
+        layout.add_widget(self.edit_category_btn)
         layout.add_widget(save_btn)
 
         self.edit_window = Popup(
@@ -448,78 +827,458 @@ class BudgetApp(App):
             content=layout,
             size_hint=(0.8, 0.3)
         )
-        self.edit_window.open()
 
     ## SAVE EDITED ENTRY - METHOD ##
 
-    def save_edit(self, index, new_amount, new_category):
+    def save_edit(self, entry_id, new_amount, new_category):
         try:
             new_amount = float(new_amount)
         except ValueError:
             return
 
-        self.saved_amounts[index]["amount"] = new_amount
-        self.saved_amounts[index]["category"] = new_category
+        # The button reads "Uncategorized" for entries without a category #
+        if new_category not in CATEGORIES:
+            new_category = None
 
-        with open("data.json", "w") as f:
-            json.dump(self.saved_amounts, f, default=str)
+        entry = self.ledger.edit(entry_id, new_amount, new_category)
 
-        self.update_display()
+        self.update_row(entry)
         self.edit_window.dismiss()  
 
-    ## OPEN CATEGORY WINDOW FOR EDIT - METHOD ##
-
-    def open_category_window_for_edit(self, index, category_btn):
-        self.editing_index = index
-        self.editing_category_btn = category_btn
-        self.open_category_window()
-
     ## ERROR POPUP - METHOD ##
 
     def show_error(self, message):
-        popup = Popup(
-            title="Error",
-            content=Label(text=message),
-            size_hint=(0.6, 0.3)
+        if self.error_popup is None:
+            from kivy.uix.popup import Popup
+
+            self.error_label = Label()
+            self.error_popup = Popup(
+                title="Error",
+                content=self.error_label,
+                size_hint=(0.6, 0.3)
+            )
+
+        self.error_label.text = message
+        self.error_popup.open()
+
+    ## BUDGET WINDOW - METHODS ##
+
+    # Figures come from the ledger's day buckets (see budget_rows and    #
+    # month_totals), so opening this costs a few lookups per category    #
+    # and month however large the ledger is                              #
+
+    def open_budget_window(self, instance):
+        if self.budget_window is None:
+            self.build_budget_window()
+
+        self.show_budget()
+        self.budget_window.open()
+
+    def show_budget(self):
+        now = datetime.now()
+        months = month_totals(self.ledger, now)
+
+        self.budget_label.text = (
+            f"This month: ${format_cents(months[-1][1])}\n"
+            f"Last month: ${format_cents(months[-2][1])}"
         )
-        popup.open()
+        self.category_bars.show(budget_rows(self.ledger, self.limits, now))
+        self.month_chart.show(months)
+
+    def build_budget_window(self):
+        from kivy.uix.popup import Popup
+        from kivy.uix.scrollview import ScrollView
+
+        self.limits = BudgetLimits().load()
+
+        layout = BoxLayout(orientation="vertical", padding=5, spacing=10)
+
+        self.budget_label = Label(size_hint_y=None, height=50)
+
+        # Tapping a category sets its limit #
+        self.category_bars = CategoryBars(size_hint_y=None)
+        bars_view = ScrollView(size_hint_y=0.65)
+        bars_view.add_widget(self.category_bars)
+
+        # Tapping a month scrolls the list to it #
+        self.month_chart = MonthChart(size_hint_y=0.35)
+
+        layout.add_widget(self.budget_label)
+        layout.add_widget(bars_view)
+        layout.add_widget(self.month_chart)
+
+        self.budget_window = Popup(
+            title="Budget",
+            content=layout,
+            size_hint=(0.9, 0.9)
+        )
+
+    ## BUDGET LIMIT WINDOW - METHODS ##
+
+    def open_limit_window(self, category):
+        if self.limit_window is None:
+            self.build_limit_window()
+
+        limit = self.limits.get(category)
+        self.limit_category = category
+        self.limit_input.text = format_cents(limit) if limit else ""
+        self.limit_window.title = f"Monthly limit: {category or 'Uncategorized'}"
+
+        self.limit_window.open()
+
+    def build_limit_window(self):
+        from kivy.uix.popup import Popup
+        from kivy.uix.textinput import TextInput
+
+        layout = BoxLayout(orientation="vertical", padding=10, spacing=10)
+
+        # Left empty, the category has no limit #
+        self.limit_input = TextInput(
+            multiline=False,
+            input_filter="float",
+            size_hint_y=None,
+            height=40
+        )
+
+        save_btn = Button(text="Save", size_hint=(1, 0.3))
+        save_btn.bind(on_release=lambda inst: self.save_limit(self.limit_category, self.limit_input.text))
+
+        layout.add_widget(self.limit_input)
+        layout.add_widget(save_btn)
+
+        self.limit_window = Popup(
+            title="Monthly limit",
+            content=layout,
+            size_hint=(0.8, 0.25)
+        )
+
+    def save_limit(self, category, value):
+        value = value.strip()
+
+        try:
+            cents = to_cents(float(value)) if value else None
+        except ValueError:
+            self.show_error("Please enter a valid number.")
+            return
+
+        self.limits.set(category, cents)
+
+        self.limit_window.dismiss()
+        self.show_budget()
+
+    ## FILTER - METHODS ##
+
+    # The field above the list narrows it as it is typed in (see      #
+    # parse_query for what it understands). A filtered list is redone #
+    # from the ledger's search index on every change, not patched.    #
+
+    def build_filter_field(self, dt):
+        from kivy.uix.textinput import TextInput
+
+        self.filter_input = TextInput(
+            hint_text="Filter: food, >20, 10-50, march",
+            multiline=False,
+            write_tab=False
+        )
+        self.filter_input.bind(text=lambda inst, text: self.filter_trigger())
+        self.filter_bar.add_widget(self.filter_input)
+
+    def apply_filter(self, dt):
+        query = parse_query(self.filter_input.text)
+        if query is None and self.query is None:
+            return
+
+        self.query = query
+        self.update_display()
+        self.rv.scroll_y = 1
+
+    # Keys to show, or None for the whole ledger #
+
+    def filtered_keys(self):
+        if self.query is None:
+            return None
+        return self.ledger.search(self.query)
 
     ## UPDATE DISPLAY - METHOD ##
 
     def update_display(self):
-        if not self.saved_amounts:
-            self.rv.data = [{
-                "timestamp_text": "No entries yet.",
-                "category_text": "",
-                "amount_text": "",
-                "index": -1
-            }]
+        self.update_totals()
+
+        self.shown_keys = keys = self.filtered_keys()
+        if len(self.ledger if keys is None else keys) >= BACKGROUND_ROWS:
+            self.refresh_view(keys)
+        else:
+            self.stop_publishing()
+            self.pending_version = None
+            self.rv.data = build_rows(self.ledger, keys)
+
+    ## BACKGROUND ROW BUILDING - METHODS ##
+
+    # Rows for a large ledger are built on a worker thread (see       #
+    # compute_view) and handed back through Clock.schedule_once. They #
+    # then go into rv.data PUBLISH_CHUNK rows at a time, each frame   #
+    # only until FRAME_BUDGET is used up, so frames keep coming.      #
+
+    # keys as from filtered_keys(); worked out here if not given #
+
+    def refresh_view(self, keys=None):
+        self.stop_publishing()
+        self.pending_version = self.ledger.version
+        self.streamed = []
+
+        if keys is None:
+            self.shown_keys = keys = self.filtered_keys()
+        query = self.query
+
+        compute_view(
+            self.ledger,
+            lambda view: Clock.schedule_once(lambda dt: self.start_publishing(view, query)),
+            keys
+        )
+
+    def start_publishing(self, view, query=None):
+        # A newer rebuild was asked for since this one started #
+        if view.version != self.pending_version or query is not self.query:
             return
-            
-        sorted_entries = sorted(self.saved_amounts, key=lambda x: x["timestamp"], reverse=True)
 
-        rows = []
-        for sorted_entry in sorted_entries:
-            original_index = self.saved_amounts.index(sorted_entry)
+        # The ledger changed while the rows were being built #
+        if view.version != self.ledger.version:
+            self.refresh_view()
+            return
+
+        self.pending_version = None
+        self.update_totals()
+
+        rows = view.rows
+        if self.streamed:
+            # The "No matching entries." row goes if any loaded since do #
+            if rows[0]["entry_id"] == -1:
+                rows = []
+            rows += self.streamed
+            self.streamed = []
+
+        self.publishing = rows
+        self.published = 0
+        self.rv.data = []
+        self.publish_rows(0)
+
+    def publish_rows(self, dt):
+        rows = self.publishing
+        start = time.perf_counter()
 
-            t = sorted_entry["timestamp"].strftime("%b %d, %I:%M %p")
-            category = sorted_entry["category"] or "Uncategorized"
-            amount = f"${sorted_entry['amount']:.2f}"
+        while self.published < len(rows):
+            end = self.published + PUBLISH_CHUNK
+            self.rv.data.extend(rows[self.published:end])
+            self.published = end
 
-            rows.append({
-                "timestamp_text": t,
-                "category_text": category,
-                "amount_text": amount,
-                "index": original_index
-            })
+            if time.perf_counter() - start >= FRAME_BUDGET:
+                break
+
+        if self.published < len(rows):
+            self.publish_event = Clock.schedule_once(self.publish_rows, 0)
+        else:
+            self.publishing = None
+
+    def stop_publishing(self):
+        if self.publish_event is not None:
+            self.publish_event.cancel()
+            self.publish_event = None
+        self.publishing = None
+
+    # True while rows are being rebuilt, so rv.data is not the ledger #
+    # yet and must not be patched. A rebuild still running notices a #
+    # change when it lands; rows being published are redone, and so  #
+    # is a filtered list.                                             #
+
+    def rebuilding(self):
+        if self.query is not None:
+            self.refilter_trigger()
+            return True
+
+        if self.publishing is not None:
+            self.refresh_view()
+        return self.pending_version is not None
+
+    ## ROW CHANGES - METHODS ##
+
+    # An add/edit/delete changes one item of rv.data in place, so the #
+    # RecycleView refreshes that one row instead of every view.       #
+
+    def insert_row(self, entry):
+        self.update_totals()
+
+        if self.rebuilding():
+            return
+
+        # The first entry replaces the "No entries yet." row #
+        if len(self.ledger) == 1:
+            self.rv.data = build_rows(self.ledger)
+        else:
+            self.rv.data.insert(self.ledger.position(entry.id), self.ledger.rows.row(entry))
+
+    def update_row(self, entry):
+        self.update_totals()
+
+        if self.rebuilding():
+            return
+
+        self.rv.data[self.ledger.position(entry.id)] = self.ledger.rows.row(entry)
+
+    def remove_row(self, position):
+        self.update_totals()
+
+        if self.rebuilding():
+            return
+
+        if not self.ledger:
+            self.rv.data = build_rows(self.ledger)
+        else:
+            self.rv.data.pop(position)
+
+    ## LOAD OLDER ENTRIES - METHOD ##
+
+    def load_next_chunk(self, dt):
+        chunk = next(self.loader, None)
+        if chunk is None:
+            self.loader = None
+            return False
+
+        self.update_totals()
+
+        if self.pending_version is not None or self.publishing is not None:
+            self.extend_rebuild(chunk)
+            return
+
+        if self.query is not None:
+            self.extend_filtered(chunk)
+            return
+
+        # Older than everything shown, so the rows go at the bottom #
+        if len(self.ledger) == len(chunk):
+            self.rv.data = build_rows(self.ledger)
+        else:
+            self.rv.data.extend(self.ledger.rows.row(entry) for entry in chunk)
+
+    # Loaded entries are older than everything a rebuild has, so their #
+    # rows just go after its rows, and the rebuild carries on          #
+
+    def extend_rebuild(self, chunk):
+        if self.query is not None:
+            chunk = [entry for entry in chunk if self.query.matches(entry)]
+            self.shown_keys.extend(order_key(entry) for entry in chunk)
+
+        rows = [self.ledger.rows.row(entry) for entry in chunk]
+        if self.publishing is not None:
+            self.publishing.extend(rows)
+        else:
+            self.streamed.extend(rows)
+
+    # With a filter, only the chunk's matching entries are added, so #
+    # loading does not redo the search (and its indexes) every chunk #
+
+    def extend_filtered(self, chunk):
+        matched = [entry for entry in chunk if self.query.matches(entry)]
+        if not matched:
+            return
+
+        # The first match replaces the "No matching entries." row #
+        if not self.shown_keys:
+            self.rv.data = []
+
+        self.shown_keys.extend(order_key(entry) for entry in matched)
+        self.rv.data.extend(self.ledger.rows.row(entry) for entry in matched)
+
+    ## LOAD OLDER ENTRIES ON SCROLL - METHOD ##
+
+    def load_if_near_end(self, dt):
+        if self.loader is None:
+            return
+
+        hidden = len(self.rv.data) * ROW_HEIGHT - self.rv.height
+        if hidden > 0 and self.rv.scroll_y * hidden > LOAD_AHEAD_ROWS * ROW_HEIGHT:
+            return
+
+        offset = (1 - self.rv.scroll_y) * max(hidden, 0)
+
+        if self.load_next_chunk(dt) is False:
+            return
+
+        # Keep the same rows on screen now that the list is longer #
+        hidden = len(self.rv.data) * ROW_HEIGHT - self.rv.height
+        if hidden > 0:
+            self.rv.scroll_y = 1 - offset / hidden
+
+        # Still short of the end? Check again next frame #
+        self.load_trigger()
+
+    ## JUMP TO ROW / DATE - METHODS ##
+
+    def scroll_to_row(self, index):
+        self.rv.scroll_y = self.rv.layout_manager.scroll_y_for(self.rv, index)
+
+    # A binary search for the row, then arithmetic for the scroll offset #
+
+    def jump_to_date(self, timestamp):
+        if self.shown_keys is None:
+            self.scroll_to_row(self.ledger.position_at(timestamp))
+        else:
+            self.scroll_to_row(bisect_left(self.shown_keys, (-to_micros(timestamp), -2**63)))
+
+    # From the budget window's month chart: the list scrolls to the #
+    # month's newest entry, or the nearest older one                 #
+
+    def jump_to_month(self, month):
+        self.budget_window.dismiss()
+
+        start, end = month_bounds(month)
+        self.jump_to_date(end - timedelta(microseconds=1))
+
+    ## UPDATE TOTALS - METHOD ##
+
+    def update_totals(self):
+        self.show_totals(self.ledger.totals.cents, self.ledger.totals.count)
+
+    def show_totals(self, cents, count):
+        self.spent_label.text = f"Total Spent: ${format_cents(cents)}"
+        self.trans_label.text = f"Total Transactions: {count}"
+
+    ## STARTUP REPORT - METHODS ##
+
+    # Logs how long cold start took up to the first frame on screen: #
+    # module imports, window and app setup, the first page of data,  #
+    # building the widgets, and drawing the first frame.             #
+
+    def on_start(self):
+        from kivy.core.window import Window
+        Window.fbind("on_flip", self.report_startup)
+
+    def report_startup(self, *args):
+        from kivy.core.window import Window
+        Window.funbind("on_flip", self.report_startup)
+
+        # Not needed for the first frame, so built just after it #
+        Clock.schedule_once(self.build_filter_field)
+
+        shown = time.perf_counter()
+        Logger.info(
+            "Startup: imports %.3fs, setup %.3fs, data load %.3fs, "
+            "widget build %.3fs, first frame %.3fs, total %.3fs",
+            IMPORTED - STARTED,
+            self.build_started - IMPORTED,
+            self.data_loaded - self.build_started,
+            self.built - self.data_loaded,
+            shown - self.built,
+            shown - STARTED
+        )
 
-        self.rv.data = rows
+    ## APP PAUSE / STOP - METHODS ##
 
-        total_spent = sum(entry["amount"] for entry in self.saved_amounts)
-        total_transactions = len(self.saved_amounts)
+    def on_pause(self):
+        self.ledger.flush()
+        return True
 
-        self.spent_label.text = f"Total Spent: ${total_spent:.2f}"
-        self.trans_label.text = f"Total Transactions: {total_transactions}"
+    def on_stop(self):
+        self.ledger.close()
 
     ## UPDATE TOP BAR RECTANGLE ON RESIZE/MOVE - METHOD ##
 
@@ -529,4 +1288,5 @@ class BudgetApp(App):
 
         top_bar.bind(pos=update_rect, size=update_rect)
 
-BudgetApp().run()
\ No newline at end of file
+if __name__ == "__main__":
+    BudgetApp().run()
\ No newline at end of file
@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime, timedelta
+
+# Run from a checkout without installing anything #
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_engine import (
+    CATEGORIES, JsonStore, Ledger, SegmentStore, SQLiteStore, Transaction, build_rows,
+    parse_query, to_micros
+)
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Mutations timed per size; the reported figure is the mean #
+OPS = 200
+
+# Filters typed into the app's filter field, timed once their indexes #
+# are built                                                           #
+SEARCHES = ["food", "ent sav", "food >300", "food ent mar", "20-50", "2025-03", "bills 2024-06 <100"]
+
+## SYNTHETIC LEDGER ##
+
+# Seeded, so every run at a given size sees the same ledger. Entries  #
+# are spread over the years before END with amounts up to $500.      #
+
+END = datetime(2026, 1, 1)
+
+def synthetic_entries(size, seed=0):
+    rng = random.Random(seed)
+    end = to_micros(END)
+    span = 365 * 5 * 86_400 * 1_000_000
+
+    for entry_id in range(1, size + 1):
+        yield Transaction(
+            entry_id,
+            rng.randint(1, 50_000),
+            end - rng.randrange(span),
+            rng.choice(CATEGORIES)
+        )
+
+def write_ledger(directory, size, backend, seed=0):
+    entries = {entry.id: entry for entry in synthetic_entries(size, seed)}
+    JsonStore(os.path.join(directory, "data.json")).write_snapshot(entries)
+    del entries
+
+    store = open_bench_store(directory, backend)
+    if backend != "json":
+        # Import data.json once so the timed load reads the new store #
+        store.load()
+        store.close()
+
+def open_bench_store(directory, backend):
+    data_path = os.path.join(directory, "data.json")
+    journal_path = os.path.join(directory, "data.journal")
+
+    if backend == "segments":
+        return SegmentStore(
+            os.path.join(directory, "data"),
+            import_from=JsonStore(data_path, journal_path)
+        )
+    if backend == "sqlite":
+        return SQLiteStore(
+            os.path.join(directory, "data.db"),
+            import_from=JsonStore(data_path, journal_path)
+        )
+    return JsonStore(data_path, journal_path)
+
+## MEASUREMENTS ##
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def mean_micros(seconds, count):
+    return seconds / count * 1_000_000
+
+def bench_size(size, backend, seed):
+    directory = tempfile.mkdtemp(prefix="budget-bench-")
+
+    try:
+        write_ledger(directory, size, backend, seed)
+
+        # First page of a streamed load, as shown by BudgetApp.build() #
+        ledger = Ledger(open_bench_store(directory, backend), background=False)
+        start = time.perf_counter()
+        next(ledger.stream(), None)
+        first_page_seconds = time.perf_counter() - start
+        ledger.close()
+
+        # Full cold load #
+        ledger, load_seconds = timed(Ledger(open_bench_store(directory, backend)).load)
+
+        rng = random.Random(seed + 1)
+        ops = min(OPS, size)
+
+        # Adds, timed as the UI sees them (the writer thread does the I/O) #
+        start = time.perf_counter()
+        for _ in range(ops):
+            ledger.add(rng.randint(1, 50_000) / 100, rng.choice(CATEGORIES))
+        add_seconds = time.perf_counter() - start
+
+        ids = rng.sample(sorted(ledger.entries), ops * 2)
+
+        start = time.perf_counter()
+        for entry_id in ids[:ops]:
+            ledger.edit(entry_id, rng.randint(1, 50_000) / 100, rng.choice(CATEGORIES))
+        edit_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for entry_id in ids[ops:]:
+            ledger.delete(entry_id)
+        delete_seconds = time.perf_counter() - start
+
+        # Row building done by update_display, first with every row #
+        # formatted and then from the rows cached by the first pass   #
+        rows, rows_seconds = timed(build_rows, ledger)
+        rows, cached_rows_seconds = timed(build_rows, ledger)
+
+        # Spending by category over random date ranges, as the budget #
+        # window asks for it                                          #
+        start = time.perf_counter()
+        for _ in range(ops):
+            first = END - timedelta(days=rng.randrange(365 * 5))
+            ledger.category_totals(first, first + timedelta(days=rng.randint(1, 90)))
+        range_seconds = time.perf_counter() - start
+
+        queries = [parse_query(text, END) for text in SEARCHES]
+        for query in queries:
+            ledger.search(query)
+        start = time.perf_counter()
+        for query in queries:
+            ledger.search(query)
+        search_seconds = time.perf_counter() - start
+
+        ledger.close()
+        del rows, ledger
+
+        # Peak memory of a cold load, measured on its own #
+        tracemalloc.start()
+        ledger = Ledger(open_bench_store(directory, backend), background=False).load()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        ledger.close()
+
+        return {
+            "size": size,
+            "backend": backend,
+            "first_page_s": first_page_seconds,
+            "load_s": load_seconds,
+            "add_us": mean_micros(add_seconds, ops),
+            "edit_us": mean_micros(edit_seconds, ops),
+            "delete_us": mean_micros(delete_seconds, ops),
+            "build_rows_s": rows_seconds,
+            "cached_rows_s": cached_rows_seconds,
+            "range_totals_us": mean_micros(range_seconds, ops),
+            "search_us": mean_micros(search_seconds, len(queries)),
+            "load_peak_bytes": peak_bytes
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+## ENTRY POINT ##
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the budget engine on synthetic ledgers.")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="comma-separated ledger sizes, e.g. 1000,10000000"
+    )
+    parser.add_argument("--backend", choices=["json", "sqlite", "segments"], default="json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(",")):
+        result = bench_size(size, args.backend, args.seed)
+        results.append(result)
+        print(f"{size:>10,}  first page {result['first_page_s']:.4f}s  load {result['load_s']:.3f}s  rows {result['build_rows_s']:.3f}s", file=sys.stderr)
+
+    report = {
+        "python": sys.version.split()[0],
+        "seed": args.seed,
+        "ops_per_size": OPS,
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
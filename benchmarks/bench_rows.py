@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Run from a checkout without installing anything #
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+from kivy.clock import Clock
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataAdapter
+
+from BudgetApp import EntryRow
+from budget_engine import format_row
+
+from bench_ledger import synthetic_entries
+
+# Rows created, and rows refreshed with other data, per run #
+ROWS = 200
+REFRESHES = 5_000
+
+## ROW COST ##
+
+# What the RecycleView does with EntryRow while scrolling: create a view #
+# for a row, and refresh a recycled view with another row's data.       #
+# Clock.tick_draw() runs the label re-rendering Kivy defers to the next #
+# frame, so it is counted too.                                         #
+
+def row_data(count, seed=0):
+    return [format_row(entry) for entry in synthetic_entries(count, seed)]
+
+def widget_count(widget):
+    return sum(1 for _ in widget.walk())
+
+def canvas_count(widget):
+    return sum(
+        len(w.canvas.before.children) + len(w.canvas.children) + len(w.canvas.after.children)
+        for w in widget.walk()
+    )
+
+def bench_rows(rows, refreshes, seed):
+    data = row_data(max(rows, 1_000), seed)
+
+    adapter = RecycleDataAdapter()
+    adapter.attach_recycleview(RecycleView())
+
+    start = time.perf_counter()
+    views = []
+    for i in range(rows):
+        views.append(adapter.create_view(i, data[i], EntryRow))
+        Clock.tick_draw()
+    create_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(refreshes):
+        adapter.refresh_view_attrs(i % len(data), data[i % len(data)], views[i % rows])
+        Clock.tick_draw()
+    refresh_seconds = time.perf_counter() - start
+
+    return {
+        "rows": rows,
+        "refreshes": refreshes,
+        "widgets_per_row": widget_count(views[0]),
+        "canvas_instructions_per_row": canvas_count(views[0]),
+        "create_us": create_seconds / rows * 1_000_000,
+        "refresh_us": refresh_seconds / refreshes * 1_000_000
+    }
+
+## ENTRY POINT ##
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time creating and refreshing transaction rows.")
+    parser.add_argument("--rows", type=int, default=ROWS)
+    parser.add_argument("--refreshes", type=int, default=REFRESHES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    result = bench_rows(args.rows, args.refreshes, args.seed)
+    report = {"python": sys.version.split()[0], "seed": args.seed, "result": result}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+from .transaction import CATEGORIES, Transaction, to_cents, to_micros, from_micros
+from .storage import DATA_VERSION, SCHEMA_VERSION, JsonStore, SQLiteStore, BackgroundWriter, open_store
+from .indexes import TimeOrder, RunningTotals, TimeBuckets, month_bounds, order_key
+from .segments import SegmentStore
+from .ledger import Ledger
+from .view import RowCache, build_rows, format_cents, format_row, empty_rows
+from .viewmodel import ViewModel, compute_view
+from .budget import BudgetLimits, budget_rows, month_totals
+from .search import Query, SearchIndex, parse_query
@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+from datetime import timedelta
+
+from .indexes import month_bounds
+from .storage import atomic_write
+from .transaction import CATEGORIES
+
+BUDGET_FILE = "budget.json"
+BUDGET_VERSION = 1
+
+log = logging.getLogger(__name__)
+
+## BUDGET LIMITS ##
+
+# Monthly spending limit per category, in cents, kept in budget.json: #
+#   {"version": 1, "limits": [[category, cents], ...]}                #
+# with None for uncategorized entries. A missing or unreadable file   #
+# means no limits.                                                    #
+
+class BudgetLimits:
+    def __init__(self, path=BUDGET_FILE):
+        self.path = path
+        self.limits = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+
+        try:
+            with open(self.path) as f:
+                self.limits = {category: cents for category, cents in json.load(f)["limits"]}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("Ignoring unreadable %s: %s", self.path, e)
+            self.limits = {}
+        return self
+
+    def get(self, category):
+        return self.limits.get(category)
+
+    # A limit of None or 0 removes the category's limit #
+
+    def set(self, category, cents):
+        if cents:
+            self.limits[category] = cents
+        else:
+            self.limits.pop(category, None)
+
+        atomic_write(self.path, json.dumps({
+            "version": BUDGET_VERSION,
+            "limits": [[category, cents] for category, cents in self.limits.items()]
+        }))
+
+## BUDGET FIGURES ##
+
+# What the budget window shows, answered from the ledger's day buckets #
+# (see TimeBuckets) rather than from its entries.                      #
+
+# (category, cents spent, limit in cents or None) for the month holding #
+# timestamp: every category in CATEGORIES, then uncategorized entries  #
+# if there are any                                                     #
+
+def budget_rows(ledger, limits, timestamp):
+    start, end = month_bounds(timestamp)
+    spent = ledger.category_totals(start, end)
+
+    return [
+        (category, spent.get(category, 0), limits.get(category))
+        for category in CATEGORIES + [None]
+        if category is not None or category in spent
+    ]
+
+# (first day of month, cents spent) for count months up to and #
+# including the one holding timestamp, oldest first            #
+
+def month_totals(ledger, timestamp, count=12):
+    months = []
+    start, end = month_bounds(timestamp)
+
+    for _ in range(count):
+        months.append((start, ledger.spent_between(start, end)))
+        start, end = month_bounds(start - timedelta(days=1))[0], start
+
+    months.reverse()
+    return months
@@ -0,0 +1,236 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from .transaction import to_micros
+
+## TIME ORDER ##
+
+# (-micros, -id) keys kept sorted, i.e. newest first, so a change is #
+# placed with a binary search instead of re-sorting the whole ledger, #
+# and entries streamed in newest first are appended at the end.       #
+
+def order_key(entry):
+    return (-entry.micros, -entry.id)
+
+class TimeOrder:
+    def __init__(self, entries=()):
+        self.keys = sorted(order_key(entry) for entry in entries)
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Returns the key, which other indexes can share (see SearchIndex) #
+
+    def add(self, entry):
+        key = order_key(entry)
+
+        if not self.keys or key > self.keys[-1]:
+            self.keys.append(key)
+        else:
+            insort(self.keys, key)
+        return key
+
+    def remove(self, entry):
+        key = order_key(entry)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    # Where the entry is (or would go) in newest-first order #
+
+    def position(self, entry):
+        return bisect_left(self.keys, order_key(entry))
+
+    # Where the newest entry at or before micros is #
+
+    def index_at(self, micros):
+        return bisect_left(self.keys, (-micros, -2**63))
+
+    def newest_first(self):
+        for micros, entry_id in self.keys:
+            yield -entry_id
+
+## RUNNING TOTALS ##
+
+# Totals for the info panel in integer cents, adjusted by each #
+# add/edit/delete instead of being summed over the whole ledger. #
+
+class RunningTotals:
+    def __init__(self, entries=()):
+        self.cents = 0
+        self.count = 0
+        self.category_cents = {}
+        self.category_count = {}
+
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        self.adjust(entry.category, 1, entry.cents)
+
+    def remove(self, entry):
+        self.adjust(entry.category, -1, -entry.cents)
+
+    # Also used to count entries that are summarized but not loaded #
+
+    def adjust(self, category, count, cents):
+        self.cents += cents
+        self.count += count
+
+        remaining = self.category_count.get(category, 0) + count
+        if remaining:
+            self.category_count[category] = remaining
+            self.category_cents[category] = self.category_cents.get(category, 0) + cents
+        else:
+            self.category_count.pop(category, None)
+            self.category_cents.pop(category, None)
+
+## TIME BUCKETS ##
+
+# Spending per category per day, as prefix sums in Fenwick trees, so #
+# "spent between A and B" or "this month by category" takes a few    #
+# O(log days) lookups, and an add/edit/delete is a few updates.       #
+# Days are counted from EPOCH; the covered span grows as needed.      #
+
+DAY_MICROS = 86_400 * 1_000_000
+
+def day_of(micros):
+    return micros // DAY_MICROS
+
+def month_bounds(timestamp):
+    start = datetime(timestamp.year, timestamp.month, 1)
+    if start.month == 12:
+        return start, datetime(start.year + 1, 1, 1)
+    return start, datetime(start.year, start.month + 1, 1)
+
+class Fenwick:
+    def __init__(self, slots):
+        # Plain per-slot values; the tree is built from them on the #
+        # first query after invalidate(), so bulk loads stay cheap  #
+        self.slots = list(slots)
+        self.tree = None
+
+    def build(self):
+        tree = self.tree = [0] + self.slots
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+
+    def invalidate(self):
+        self.tree = None
+
+    def add(self, slot, delta):
+        self.slots[slot] += delta
+
+        tree = self.tree
+        if tree is None:
+            return
+        i = slot + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    # Sum of slots [0, end) #
+
+    def prefix(self, end):
+        if self.tree is None:
+            self.build()
+
+        tree = self.tree
+        total = 0
+        while end > 0:
+            total += tree[end]
+            end -= end & -end
+        return total
+
+    def range(self, start, end):
+        return self.prefix(end) - self.prefix(start)
+
+class TimeBuckets:
+    def __init__(self, entries=()):
+        self.first_day = 0
+        self.days = 0
+
+        # Category -> Fenwick of cents / of entry counts, one slot per day #
+        self.cents = {}
+        self.counts = {}
+
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        self.adjust(entry.category, entry.micros, 1, entry.cents)
+
+    def remove(self, entry):
+        self.adjust(entry.category, entry.micros, -1, -entry.cents)
+
+    # Before many changes in a row: they then only touch the slots, #
+    # and the trees are rebuilt once, by the next query             #
+
+    def invalidate(self):
+        for trees in (self.cents, self.counts):
+            for tree in trees.values():
+                tree.invalidate()
+
+    def adjust(self, category, micros, count, cents):
+        day = micros // DAY_MICROS
+        slot = day - self.first_day
+        if not 0 <= slot < self.days:
+            slot = self.cover(day)
+
+        tree = self.cents.get(category)
+        if tree is None:
+            tree = self.cents[category] = Fenwick([0] * self.days)
+            self.counts[category] = Fenwick([0] * self.days)
+
+        tree.add(slot, cents)
+        self.counts[category].add(slot, count)
+
+    # Grows the covered span to include day and returns its slot #
+
+    def cover(self, day):
+        first = min(day, self.first_day) if self.days else day
+        last = max(day + 1, self.first_day + self.days) if self.days else day + 1
+
+        # Leave room either side, so growing again is rare #
+        room = max(last - first, 366)
+        self.grow(first - room, last + room)
+
+        return day - self.first_day
+
+    def grow(self, first, last):
+        before = self.first_day - first if self.days else 0
+        after = last - first - before - self.days
+
+        for trees in (self.cents, self.counts):
+            for category, tree in trees.items():
+                trees[category] = Fenwick([0] * before + tree.slots + [0] * after)
+
+        self.first_day = first
+        self.days = last - first
+
+    ## QUERIES - METHODS ##
+
+    # start/end are datetimes; either may be None for an open range. #
+    # Buckets are whole days, so both count from their day's midnight. #
+
+    def slot_range(self, start, end):
+        lo = 0 if start is None else day_of(to_micros(start)) - self.first_day
+        hi = self.days if end is None else day_of(to_micros(end)) - self.first_day
+        return min(max(lo, 0), self.days), min(max(hi, 0), self.days)
+
+    def total_cents(self, start=None, end=None):
+        lo, hi = self.slot_range(start, end)
+        return sum(tree.range(lo, hi) for tree in self.cents.values())
+
+    def total_count(self, start=None, end=None):
+        lo, hi = self.slot_range(start, end)
+        return sum(tree.range(lo, hi) for tree in self.counts.values())
+
+    def category_totals(self, start=None, end=None):
+        lo, hi = self.slot_range(start, end)
+        return {
+            category: self.cents[category].range(lo, hi)
+            for category, counts in self.counts.items() if counts.range(lo, hi)
+        }
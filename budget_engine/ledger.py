@@ -0,0 +1,208 @@
+from datetime import datetime
+
+from .indexes import RunningTotals, TimeBuckets, TimeOrder, month_bounds, order_key
+from .search import SearchIndex
+from .storage import STREAM_CHUNK, BackgroundWriter, open_store
+from .transaction import Transaction, from_micros, to_cents, to_micros
+from .view import RowCache
+
+## LEDGER ##
+
+# Everything the app does with transactions, without any Kivy: loading, #
+# add/edit/delete, time order and totals. Changes go to the store      #
+# through a BackgroundWriter, or straight away with background=False.  #
+
+class Ledger:
+    def __init__(self, store=None, background=True):
+        self.store = store if store is not None else open_store()
+        self.background = background
+
+        # Transaction id -> entry #
+        self.entries = {}
+        # Bumped by every add, edit and delete, so work started on a    #
+        # snapshot can tell whether the ledger has moved on since (see  #
+        # compute_view). Loading older entries does not bump it; they   #
+        # only ever go after every entry already loaded.                #
+        self.version = 0
+        self.next_id = 1
+        self.time_order = TimeOrder()
+        self.totals = RunningTotals()
+        # Totals by day and category, for date-range queries #
+        self.buckets = TimeBuckets()
+        # Posting lists, bitmaps and amount order for filtering (see search) #
+        self.search_index = SearchIndex(self.time_order, self.entries)
+        # Display rows, formatted on first use (see build_rows) #
+        self.rows = RowCache()
+        self.writer = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, entry_id):
+        return entry_id in self.entries
+
+    ## LOAD - METHODS ##
+
+    def load(self):
+        for chunk in self.stream():
+            pass
+        return self
+
+    # Loads the ledger newest first, one chunk per step of the returned #
+    # iterator, which yields each chunk once it has been added. The     #
+    # ledger is usable (and can be changed) between steps.              #
+
+    def stream(self, chunk_size=STREAM_CHUNK):
+        self.next_id, chunks = self.store.open_stream(chunk_size)
+
+        self.entries = {}
+        self.time_order = TimeOrder()
+        self.totals = RunningTotals()
+        self.buckets = TimeBuckets()
+        self.search_index = SearchIndex(self.time_order, self.entries)
+        self.rows = RowCache()
+
+        # Totals for what has not been loaded yet, if the store has them #
+        summary = self.store.summary()
+        if summary is not None:
+            for category, count, cents in summary:
+                self.totals.adjust(category, count, cents)
+            # Counted on the first of their month until loaded #
+            for month, category, count, cents in self.store.month_summary():
+                self.buckets.adjust(category, to_micros(month), count, cents)
+
+        if self.background and self.writer is None:
+            self.writer = BackgroundWriter(self.store)
+            self.writer.start()
+
+        return self.take_chunks(chunks, counted=summary is not None)
+
+    def take_chunks(self, chunks, counted):
+        for chunk in chunks:
+            # Skip anything added here while the stream was running #
+            chunk = [entry for entry in chunk if entry.id not in self.entries]
+            self.buckets.invalidate()
+            self.search_index.invalidate()
+            for entry in chunk:
+                self.insert(entry, counted)
+            yield chunk
+
+    def insert(self, entry, counted=False):
+        self.entries[entry.id] = entry
+        key = self.time_order.add(entry)
+        self.search_index.add(entry, key)
+        if not counted:
+            self.totals.add(entry)
+        else:
+            # Move it from the first of its month to its own day #
+            month, _ = month_bounds(from_micros(entry.micros))
+            self.buckets.adjust(entry.category, to_micros(month), -1, -entry.cents)
+        self.buckets.add(entry)
+
+    ## QUERIES - METHODS ##
+
+    def get(self, entry_id):
+        return self.entries.get(entry_id)
+
+    # Index of the entry among loaded entries, newest first, which is #
+    # also its row in build_rows()                                    #
+
+    def position(self, entry_id):
+        return self.time_order.position(self.entries[entry_id])
+
+    # Row of the newest loaded entry at or before timestamp #
+
+    def position_at(self, timestamp):
+        return self.time_order.index_at(to_micros(timestamp))
+
+    # Totals over [start, end) in whole days, counting entries not yet #
+    # loaded if the store summarized them; either bound may be None   #
+
+    def spent_between(self, start=None, end=None):
+        return self.buckets.total_cents(start, end)
+
+    def category_totals(self, start=None, end=None):
+        return self.buckets.category_totals(start, end)
+
+    # Time-order keys of the loaded entries matching query (a Query, #
+    # see parse_query), newest first                                 #
+
+    def search(self, query):
+        return self.search_index.search(query)
+
+    def newest_first(self):
+        for entry_id in self.time_order.newest_first():
+            yield self.entries[entry_id]
+
+    ## CHANGES - METHODS ##
+
+    def add(self, amount, category=None, timestamp=None):
+        entry = Transaction(
+            self.next_id,
+            to_cents(amount),
+            to_micros(timestamp if timestamp is not None else datetime.now()),
+            category
+        )
+
+        self.version += 1
+        self.insert(entry)
+        self.next_id += 1
+
+        self.submit({"op": "add", "entry": entry.to_record()})
+        return entry
+
+    def edit(self, entry_id, amount, category):
+        entry = self.entries[entry_id]
+        self.version += 1
+
+        self.totals.remove(entry)
+        self.buckets.remove(entry)
+        old_category, old_cents = entry.category, entry.cents
+        entry.cents = to_cents(amount)
+        entry.category = category
+        self.totals.add(entry)
+        self.buckets.add(entry)
+        self.search_index.update(entry, old_category, old_cents)
+        self.rows.forget(entry_id)
+
+        self.submit({
+            "op": "edit",
+            "id": entry_id,
+            "cents": entry.cents,
+            "category": category,
+            "was": [entry.micros, old_cents, old_category]
+        })
+        return entry
+
+    def delete(self, entry_id):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return None
+        self.version += 1
+
+        self.time_order.remove(entry)
+        self.totals.remove(entry)
+        self.buckets.remove(entry)
+        self.search_index.remove(entry, order_key(entry))
+        self.rows.forget(entry_id)
+
+        self.submit({"op": "delete", "id": entry_id, "was": [entry.micros, entry.cents, entry.category]})
+        return entry
+
+    ## PERSISTENCE - METHODS ##
+
+    def submit(self, record):
+        if self.writer is not None:
+            self.writer.submit(record)
+        else:
+            self.store.apply([record])
+
+    def flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+        self.store.close()
@@ -0,0 +1,349 @@
+import re
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from .indexes import month_bounds, order_key
+from .transaction import CATEGORIES, to_cents, to_micros
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+
+## SEARCH QUERY ##
+
+# What the filter field asks for, from the words typed into it:      #
+#   food, ent         categories, by name prefix (any of them)         #
+#   uncategorized     entries without a category                       #
+#   12.50             that amount; >20, <100 or 20-50 for a range      #
+#   2026-03, march    that month (the latest March); 2026-03-05 a day  #
+# Different kinds of word must all match. A word that means nothing   #
+# matches no entries, but one still being typed ("12-", ">") is       #
+# skipped.                                                            #
+
+NUMBER = r"(\d+(?:\.\d+)?)"
+EXACT = re.compile(NUMBER + "$")
+ABOVE = re.compile(">" + NUMBER + "$")
+BELOW = re.compile("<" + NUMBER + "$")
+BETWEEN = re.compile(NUMBER + "-" + NUMBER + "$")
+MONTH = re.compile(r"(\d{4})-(\d{2})$")
+DAY = re.compile(r"(\d{4})-(\d{2})-(\d{2})$")
+PARTIAL = re.compile(r"[\d.<>-]*$")
+
+# Date windows with at most this many entries are checked entry by entry #
+# for an amount filter, without building amount orders for them         #
+SCAN_ENTRIES = 2000
+
+class Query:
+    def __init__(self):
+        # Set of categories (None for uncategorized), or None for any #
+        self.categories = None
+        # Inclusive, in cents #
+        self.min_cents = None
+        self.max_cents = None
+        # [start, end), as datetimes #
+        self.start = None
+        self.end = None
+        self.unmatched = False
+
+    def limit_amount(self, low, high):
+        if low is not None:
+            self.min_cents = low if self.min_cents is None else max(self.min_cents, low)
+        if high is not None:
+            self.max_cents = high if self.max_cents is None else min(self.max_cents, high)
+
+    def limit_time(self, start, end):
+        self.start = start if self.start is None else max(self.start, start)
+        self.end = end if self.end is None else min(self.end, end)
+
+    def add_categories(self, categories):
+        self.categories = (self.categories or set()) | set(categories)
+
+    # For a few entries, such as a newly loaded chunk; use SearchIndex #
+    # to search the ledger                                             #
+
+    def matches(self, entry):
+        return not (
+            self.unmatched
+            or self.categories is not None and entry.category not in self.categories
+            or self.min_cents is not None and entry.cents < self.min_cents
+            or self.max_cents is not None and entry.cents > self.max_cents
+            or self.start is not None and entry.micros < to_micros(self.start)
+            or self.end is not None and entry.micros >= to_micros(self.end)
+        )
+
+# None when there is nothing to filter by #
+
+def parse_query(text, now=None):
+    words = text.lower().split()
+    if not words:
+        return None
+
+    now = now if now is not None else datetime.now()
+    query = Query()
+
+    for word in words:
+        if not parse_word(query, word, now) and not PARTIAL.match(word):
+            query.unmatched = True
+    return query
+
+def parse_word(query, word, now):
+    try:
+        # Dates first, since 2026-03 would also read as an amount range #
+        if DAY.match(word):
+            day = datetime(*(int(n) for n in DAY.match(word).groups()))
+            query.limit_time(day, day + timedelta(days=1))
+        elif MONTH.match(word):
+            query.limit_time(*month_bounds(datetime(*(int(n) for n in MONTH.match(word).groups()), 1)))
+        elif ABOVE.match(word):
+            query.limit_amount(to_cents(float(ABOVE.match(word)[1])) + 1, None)
+        elif BELOW.match(word):
+            query.limit_amount(None, to_cents(float(BELOW.match(word)[1])) - 1)
+        elif BETWEEN.match(word):
+            low, high = sorted(to_cents(float(n)) for n in BETWEEN.match(word).groups())
+            query.limit_amount(low, high)
+        elif EXACT.match(word):
+            cents = to_cents(float(word))
+            query.limit_amount(cents, cents)
+        else:
+            return parse_name(query, word, now)
+    except ValueError:
+        return False
+    return True
+
+def parse_name(query, word, now):
+    categories = [category for category in CATEGORIES if category.lower().startswith(word)]
+    if "uncategorized".startswith(word):
+        categories.append(None)
+    if categories:
+        query.add_categories(categories)
+        return True
+
+    # Month names need three letters, so they never shadow a category #
+    if len(word) >= 3:
+        for month, name in enumerate(MONTHS, 1):
+            if name.startswith(word):
+                year = now.year if month <= now.month else now.year - 1
+                query.limit_time(*month_bounds(datetime(year, month, 1)))
+                return True
+    return False
+
+## CATEGORY BITMAPS ##
+
+# One int per category with bit i set when the entry at position i of #
+# the time order has that category, so "food or rent in March" is the #
+# OR of two ints masked to March's positions. Adding or removing an   #
+# entry shifts the bits above its position.                           #
+
+def insert_bit(bits, position, value):
+    low = bits & ((1 << position) - 1)
+    return ((bits >> position) << (position + 1)) | (value << position) | low
+
+def remove_bit(bits, position):
+    low = bits & ((1 << position) - 1)
+    return ((bits >> (position + 1)) << position) | low
+
+# Positions of the set bits, lowest first #
+
+def set_positions(bits):
+    digits = bin(bits)[:1:-1]
+    find = digits.find
+
+    positions = []
+    i = find("1")
+    while i >= 0:
+        positions.append(i)
+        i = find("1", i + 1)
+    return positions
+
+## SEARCH INDEX ##
+
+# Narrows the ledger for a Query without a pass over every entry:     #
+# per-category posting lists of time-order keys, sorted newest first  #
+# so a date range is a binary search in each, category bitmaps for    #
+# several categories at once, and entries sorted by amount. The keys  #
+# are the tuples TimeOrder holds, shared, not copied.                 #
+# Changes are passed on after TimeOrder has made them, since the      #
+# bitmaps go by position in it.                                       #
+
+# Removes item from the sorted list lists[name], and the list once empty #
+
+def remove_sorted(lists, name, item):
+    items = lists.get(name)
+    if items is None:
+        return
+
+    i = bisect_left(items, item)
+    if i < len(items) and items[i] == item:
+        del items[i]
+    if not items:
+        del lists[name]
+
+class SearchIndex:
+    def __init__(self, time_order, entries):
+        self.time_order = time_order
+        self.entries = entries
+
+        # Category -> sorted order keys #
+        self.postings = {}
+        # Category -> sorted (cents, order key), built the first time an  #
+        # amount filter needs it and then kept up to date, since a bulk   #
+        # load would insert all over it                                   #
+        self.amounts = {}
+        # Category -> bitmap (see CATEGORY BITMAPS), built the same way #
+        self.bitmaps = None
+
+    def add(self, entry, key):
+        self.add_posting(entry, key)
+
+        if self.bitmaps is not None:
+            position = bisect_left(self.time_order.keys, key)
+            self.bitmaps.setdefault(entry.category, 0)
+            for category, bits in self.bitmaps.items():
+                self.bitmaps[category] = insert_bit(bits, position, category == entry.category)
+
+    def remove(self, entry, key):
+        self.remove_posting(entry.category, entry.cents, key)
+
+        if self.bitmaps is not None:
+            position = bisect_left(self.time_order.keys, key)
+            for category, bits in self.bitmaps.items():
+                self.bitmaps[category] = remove_bit(bits, position)
+            if not self.bitmaps.get(entry.category, 1):
+                del self.bitmaps[entry.category]
+
+    # entry has been edited from category and cents; its place in the #
+    # time order is the same                                           #
+
+    def update(self, entry, category, cents):
+        position = bisect_left(self.time_order.keys, order_key(entry))
+        key = self.time_order.keys[position]
+
+        self.remove_posting(category, cents, key)
+        self.add_posting(entry, key)
+
+        if self.bitmaps is not None and category != entry.category:
+            bit = 1 << position
+            self.bitmaps[category] &= ~bit
+            if not self.bitmaps[category]:
+                del self.bitmaps[category]
+            self.bitmaps[entry.category] = self.bitmaps.get(entry.category, 0) | bit
+
+    def add_posting(self, entry, key):
+        posting = self.postings.setdefault(entry.category, [])
+        if not posting or key > posting[-1]:
+            posting.append(key)
+        else:
+            insort(posting, key)
+
+        amounts = self.amounts.get(entry.category)
+        if amounts is not None:
+            insort(amounts, (entry.cents, key))
+
+    def remove_posting(self, category, cents, key):
+        remove_sorted(self.postings, category, key)
+        remove_sorted(self.amounts, category, (cents, key))
+
+    # Before many adds in a row: amount orders and bitmaps are rebuilt #
+    # once instead                                                     #
+
+    def invalidate(self):
+        self.amounts = {}
+        self.bitmaps = None
+
+    def amount_order(self, category):
+        amounts = self.amounts.get(category)
+        if amounts is None:
+            entries = self.entries
+            amounts = self.amounts[category] = sorted(
+                (entries[-key[1]].cents, key) for key in self.postings[category]
+            )
+        return amounts
+
+    def category_bitmaps(self):
+        if self.bitmaps is None:
+            keys = self.time_order.keys
+            entries = self.entries
+
+            arrays = {category: bytearray(len(keys) // 8 + 1) for category in self.postings}
+            for i, (micros, entry_id) in enumerate(keys):
+                arrays[entries[-entry_id].category][i >> 3] |= 1 << (i & 7)
+
+            self.bitmaps = {category: int.from_bytes(bits, "little") for category, bits in arrays.items()}
+        return self.bitmaps
+
+    # Keys of the matching entries, newest first #
+
+    def search(self, query):
+        if query.unmatched:
+            return []
+
+        keys = self.time_order.keys
+        entries = self.entries
+
+        # Keys run newest first, so the window runs from end back to start #
+        first = None if query.end is None else (1 - to_micros(query.end), -2**63)
+        last = None if query.start is None else (1 - to_micros(query.start), -2**63)
+
+        # (sorted keys, lo, hi) runs holding the entries in the window; #
+        # dates that do not overlap ("2026-03 2026-05") leave it empty  #
+        def window(ordered):
+            lo = 0 if first is None else bisect_left(ordered, first)
+            hi = len(ordered) if last is None else bisect_left(ordered, last)
+            return ordered, lo, max(hi, lo)
+
+        if query.categories is None:
+            categories = self.postings
+            runs = [window(keys)]
+        else:
+            categories = [category for category in query.categories if category in self.postings]
+            runs = [window(self.postings[category]) for category in categories]
+
+        # Several categories: OR their bitmaps over the window's positions #
+        bits = None
+        if len(runs) > 1:
+            bitmaps = self.category_bitmaps()
+            ordered, lo, hi = window(keys)
+
+            bits = 0
+            for category in categories:
+                bits |= bitmaps[category]
+            bits &= (1 << hi) - (1 << lo)
+            size = bin(bits).count("1")
+        else:
+            size = sum(hi - lo for ordered, lo, hi in runs)
+
+        def found():
+            if bits is not None:
+                return [keys[i] for i in set_positions(bits)]
+            if not runs:
+                return []
+            ordered, lo, hi = runs[0]
+            return ordered[lo:hi]
+        low, high = query.min_cents, query.max_cents
+        if low is None and high is None:
+            return found()
+        low = -2**63 if low is None else low
+        high = 2**63 if high is None else high
+
+        def scan():
+            return [key for key in found() if low <= entries[-key[1]].cents <= high]
+
+        if size <= SCAN_ENTRIES:
+            return scan()
+
+        # Each category's amount range, used when clearly narrower than #
+        # the window, since its keys then need sorting back into order  #
+        spans = []
+        for category in categories:
+            ordered = self.amount_order(category)
+            spans.append((ordered, bisect_left(ordered, (low,)), bisect_left(ordered, (high + 1,))))
+
+        if sum(hi - lo for ordered, lo, hi in spans) * 3 >= size:
+            return scan()
+
+        matches = [key for ordered, lo, hi in spans for cents, key in ordered[lo:hi]]
+        if first is not None:
+            matches = [key for key in matches if key >= first]
+        if last is not None:
+            matches = [key for key in matches if key < last]
+        matches.sort()
+        return matches
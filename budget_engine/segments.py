@@ -0,0 +1,339 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from .storage import COMPACT_RECORDS, STREAM_CHUNK, JsonStore, Journal, atomic_write
+from .transaction import from_micros
+
+DATA_DIR = "data"
+MANIFEST_VERSION = 1
+
+log = logging.getLogger(__name__)
+
+def month_key(micros):
+    return from_micros(micros).strftime("%Y-%m")
+
+def month_start(month):
+    return datetime.strptime(month, "%Y-%m")
+
+## SEGMENT STORE ##
+
+# The ledger split by calendar month into data/YYYY-MM.jsonl, each an #
+# append-only log of journal records for that month's entries, plus  #
+# data/manifest.json holding next_id, every month's count and totals #
+# by category, and the size in bytes of each month's file:            #
+#   {"version": 1, "next_id": N, "months": {"2026-01":               #
+#     {"count": 6, "cents": 42854, "categories": [[cat, n, cents]]}}, #
+#    "sizes": {"2026-01": 812}}                                       #
+# Only the manifest is read up front. Months are loaded newest first  #
+# as the stream is advanced, and a change appends to its own month.   #
+
+class SegmentStore:
+    # Loaded only as far as the list is scrolled, since summary() #
+    # already has the totals without loading every entry          #
+    lazy = True
+
+    def __init__(self, directory=DATA_DIR, import_from=None):
+        # Store whose entries seed a missing manifest (default: JsonStore()) #
+        self.directory = directory
+        self.import_from = import_from
+        self.manifest_path = os.path.join(directory, "manifest.json")
+
+        # Written from the BackgroundWriter thread, read while streaming #
+        self.lock = threading.Lock()
+
+        # month -> {category: [count, cents]} #
+        self.months = {}
+        # id -> (month, cents, category) of every entry loaded or added #
+        self.loaded = {}
+        # month -> records in its file, for months read or written so far #
+        self.records = {}
+        # month -> bytes in its file, as of the last write #
+        self.sizes = {}
+        self.next_id = 1
+        self.manifest_read = False
+
+    def segment(self, month):
+        return Journal(os.path.join(self.directory, month + ".jsonl"))
+
+    ## MANIFEST - METHODS ##
+
+    def read_manifest(self):
+        if self.manifest_read:
+            return
+        self.manifest_read = True
+
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            self.import_entries()
+            return
+
+        self.next_id = manifest["next_id"]
+        self.months = {
+            month: {category: [count, cents] for category, count, cents in info["categories"]}
+            for month, info in manifest["months"].items()
+        }
+
+        # Manifests written before sizes were kept are trusted as they are #
+        if "sizes" in manifest:
+            self.sizes = manifest["sizes"]
+            self.recover_months()
+        else:
+            self.sizes = self.file_sizes()
+
+    # month -> bytes, for every month's file on disk #
+
+    def file_sizes(self):
+        return {
+            name[:-len(".jsonl")]: os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory) if name.endswith(".jsonl")
+        }
+
+    # A crash between appending to a month and writing the manifest leaves #
+    # the month's file a different size than the manifest says. Only such #
+    # months are read here: their totals are counted again from the file, #
+    # and next_id is raised past their ids so none is handed out twice.    #
+
+    def recover_months(self):
+        recovered = False
+
+        for month, size in self.file_sizes().items():
+            if self.sizes.get(month) == size:
+                continue
+
+            segment = self.segment(month)
+            entries = {}
+            segment.replay(entries)
+
+            categories = {}
+            for entry in entries.values():
+                totals = categories.setdefault(entry.category, [0, 0])
+                totals[0] += 1
+                totals[1] += entry.cents
+
+            if categories:
+                self.months[month] = categories
+            else:
+                self.months.pop(month, None)
+            self.next_id = max(self.next_id, max(entries, default=0) + 1)
+            self.sizes[month] = os.path.getsize(segment.path)
+
+            log.warning("%s: counted again after an interrupted write", segment.path)
+            recovered = True
+
+        if recovered:
+            self.write_manifest(self.months, self.next_id)
+
+    def write_manifest(self, months, next_id):
+        info = {}
+        for month, categories in sorted(months.items()):
+            info[month] = {
+                "count": sum(count for count, cents in categories.values()),
+                "cents": sum(cents for count, cents in categories.values()),
+                "categories": [
+                    [category, count, cents]
+                    for category, (count, cents) in categories.items()
+                ]
+            }
+
+        atomic_write(self.manifest_path, json.dumps(
+            {"version": MANIFEST_VERSION, "next_id": next_id, "months": info, "sizes": self.sizes},
+            separators=(",", ":")
+        ))
+
+    def import_entries(self):
+        # First run: split whatever the JSON store holds into months #
+        source = self.import_from if self.import_from is not None else JsonStore()
+        entries = source.load()
+
+        by_month = {}
+        for entry in entries.values():
+            month = month_key(entry.micros)
+            by_month.setdefault(month, []).append({"op": "add", "entry": entry.to_record()})
+            self.count_in(self.months, month, entry.category, 1, entry.cents)
+
+        os.makedirs(self.directory, exist_ok=True)
+        for month, records in by_month.items():
+            self.appended(month, records)
+
+        self.next_id = max(entries, default=0) + 1
+        self.write_manifest(self.months, self.next_id)
+
+    # Adds count and cents to a category's totals for month in months, #
+    # copying the month's totals from self.months the first time, so   #
+    # months can collect changes before they are kept (see apply)      #
+
+    def count_in(self, months, month, category, count, cents):
+        if month not in months:
+            months[month] = {
+                name: list(totals) for name, totals in self.months.get(month, {}).items()
+            }
+
+        categories = months[month]
+        totals = categories.setdefault(category, [0, 0])
+        totals[0] += count
+        totals[1] += cents
+
+        if not totals[0]:
+            del categories[category]
+
+    def appended(self, month, records):
+        segment = self.segment(month)
+        segment.append(records)
+        self.records[month] = self.records.get(month, 0) + len(records)
+        self.sizes[month] = os.path.getsize(segment.path)
+
+    # (category, count, cents) over every month, loaded or not #
+
+    def summary(self):
+        self.read_manifest()
+
+        totals = {}
+        for categories in self.months.values():
+            for category, (count, cents) in categories.items():
+                total = totals.setdefault(category, [0, 0])
+                total[0] += count
+                total[1] += cents
+
+        return [(category, count, cents) for category, (count, cents) in totals.items()]
+
+    # (first day of month, category, count, cents) for every month #
+
+    def month_summary(self):
+        self.read_manifest()
+
+        return [
+            (month_start(month), category, count, cents)
+            for month, categories in self.months.items()
+            for category, (count, cents) in categories.items()
+        ]
+
+    ## LOADING - METHODS ##
+
+    def load(self):
+        next_id, chunks = self.open_stream()
+
+        entries = {}
+        for chunk in chunks:
+            for entry in chunk:
+                entries[entry.id] = entry
+        return entries
+
+    # Same contract as JsonStore.open_stream(); each month is only read #
+    # once the stream reaches it.                                        #
+
+    def open_stream(self, chunk_size=STREAM_CHUNK):
+        self.read_manifest()
+        return self.next_id, self.stream_months(sorted(self.months, reverse=True), chunk_size)
+
+    def stream_months(self, months, chunk_size):
+        for month in months:
+            entries = {}
+
+            # Under the lock, so a torn line is never an append in progress #
+            with self.lock:
+                segment = self.segment(month)
+                segment.replay(entries)
+                self.records[month] = segment.count
+
+                for entry in entries.values():
+                    self.loaded[entry.id] = (month, entry.cents, entry.category)
+
+            newest_first = sorted(entries.values(), key=lambda e: (e.micros, e.id), reverse=True)
+            for i in range(0, len(newest_first), chunk_size):
+                yield newest_first[i:i + chunk_size]
+
+    ## WRITES - METHODS ##
+
+    # All or nothing: the batch is worked out on copies, which are kept #
+    # only once every month's file and the manifest are written. If a  #
+    # write fails, the BackgroundWriter retries the batch against the  #
+    # state it started from; months appended to before the failure    #
+    # get the same records again, which replay to the same entries.    #
+
+    def apply(self, records):
+        with self.lock:
+            # Changed (month, cents, category) per id, None once deleted #
+            loaded = {}
+            months = {}
+            next_id = self.next_id
+            by_month = {}
+
+            for record in records:
+                op = record["op"]
+
+                if op == "add":
+                    entry_id, micros, cents, category = record["entry"]
+                    month = month_key(micros)
+                    loaded[entry_id] = (month, cents, category)
+                    self.count_in(months, month, category, 1, cents)
+                    next_id = max(next_id, entry_id + 1)
+                else:
+                    entry_id = record["id"]
+                    current = loaded[entry_id] if entry_id in loaded else self.loaded.get(entry_id)
+                    if current is None:
+                        continue
+
+                    month, cents, category = current
+                    self.count_in(months, month, category, -1, -cents)
+
+                    if op == "edit":
+                        loaded[entry_id] = (month, record["cents"], record["category"])
+                        self.count_in(months, month, record["category"], 1, record["cents"])
+                    else:
+                        loaded[entry_id] = None
+
+                by_month.setdefault(month, []).append(record)
+
+            for month, month_records in by_month.items():
+                self.appended(month, month_records)
+
+            kept = dict(self.months)
+            for month, categories in months.items():
+                if categories:
+                    kept[month] = categories
+                else:
+                    kept.pop(month, None)
+            self.write_manifest(kept, next_id)
+
+            self.months = kept
+            self.next_id = next_id
+            for entry_id, current in loaded.items():
+                if current is None:
+                    self.loaded.pop(entry_id, None)
+                else:
+                    self.loaded[entry_id] = current
+
+    ## COMPACTION - METHODS ##
+
+    # A month whose file has COMPACT_RECORDS more records than entries #
+    # (edits and deletes piling up) is rewritten as one add per entry. #
+    # Only months read or written this run are counted, so untouched  #
+    # history is never reread.                                        #
+
+    def maintain(self):
+        with self.lock:
+            for month, count in list(self.records.items()):
+                live = sum(n for n, cents in self.months.get(month, {}).values())
+                if count - live >= COMPACT_RECORDS:
+                    self.compact(month)
+
+    def compact(self, month):
+        entries = {}
+        segment = self.segment(month)
+        segment.replay(entries)
+
+        newest_first = sorted(entries.values(), key=lambda e: (e.micros, e.id), reverse=True)
+        segment.rewrite([{"op": "add", "entry": entry.to_record()} for entry in newest_first])
+        self.records[month] = segment.count
+
+        # The file is smaller now; see recover_months #
+        self.sizes[month] = os.path.getsize(segment.path)
+        self.write_manifest(self.months, self.next_id)
+
+    def close(self):
+        pass
@@ -0,0 +1,840 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import zlib
+
+from datetime import datetime
+
+from .indexes import month_bounds
+from .transaction import Transaction, from_micros, to_cents, to_micros
+
+DATA_FILE = "data.json"
+JOURNAL_FILE = "data.journal"
+DB_FILE = "data.db"
+
+# "json" keeps data.json plus the journal, "sqlite" keeps data.db, #
+# "segments" keeps one file per month under data/ (see SegmentStore) #
+STORAGE_BACKEND = "json"
+
+# Versions of the data.json format and of the SQLite schema #
+DATA_VERSION = 3
+SCHEMA_VERSION = 2
+
+# Entries handed over per step when the ledger is streamed in #
+STREAM_CHUNK = 500
+
+# Characters read from data.json at a time while streaming #
+READ_BLOCK = 64 * 1024
+
+# Seconds of quiet before queued changes are written out #
+WRITE_DELAY = 0.5
+
+# Seconds before a failed write (disk full, card removed) is tried again #
+RETRY_DELAY = 5
+
+# Journal records after which the writer folds them into a snapshot, #
+# which bounds how much has to be replayed on the next start          #
+COMPACT_RECORDS = 1000
+
+log = logging.getLogger(__name__)
+
+## TRANSACTION JOURNAL ##
+
+# data.json holds the ledger as it was last written in full, and every #
+# add/edit/delete since then is appended to the journal as one record. #
+# build() loads data.json and replays the journal on top of it.        #
+# Each line is "<crc32 of the JSON, 8 hex digits> <JSON record>", so a #
+# torn or damaged line is caught rather than half-applied.             #
+
+class Journal:
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        # Records in the file, as of the last recover()/append()/rewrite() #
+        self.count = 0
+
+    # A batch that fails part way is cut off again, so when it is retried #
+    # it does not land behind a torn line that recover() would stop at    #
+
+    def append(self, records):
+        lines = memoryview("".join(encode_line(record) for record in records).encode())
+
+        with open(self.path, "ab", buffering=0) as f:
+            end = f.seek(0, os.SEEK_END)
+            try:
+                while lines:
+                    lines = lines[f.write(lines):]
+                os.fsync(f.fileno())
+            except OSError:
+                f.truncate(end)
+                raise
+
+        self.count += len(records)
+
+    def rewrite(self, records):
+        atomic_write(self.path, "".join(encode_line(record) for record in records))
+        self.count = len(records)
+
+    # Reads the longest run of intact records from the top. Anything #
+    # after it is copied to <path>.corrupt and cut off, so appends    #
+    # made from now on are not stranded behind a bad line.            #
+
+    def recover(self):
+        records = []
+        valid_end = 0
+
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    record = decode_line(line)
+                    if record is None:
+                        break
+                    if record is not False:
+                        records.append(record)
+                    valid_end += len(line)
+
+                size = f.seek(0, os.SEEK_END)
+        except FileNotFoundError:
+            self.count = 0
+            return records
+
+        if valid_end < size:
+            log.warning(
+                "%s: dropping %d damaged bytes after %d records (kept in %s.corrupt)",
+                self.path, size - valid_end, len(records), self.path
+            )
+            shutil.copyfile(self.path, self.path + ".corrupt")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+                f.flush()
+                os.fsync(f.fileno())
+
+        self.count = len(records)
+        return records
+
+    def records(self):
+        return self.recover()
+
+    def replay(self, entries):
+        for record in self.records():
+            apply_record(entries, record)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.count = 0
+
+def encode_line(record):
+    text = json.dumps(record, separators=(",", ":"))
+    return f"{zlib.crc32(text.encode()):08x} {text}\n"
+
+# Of a run of records as the journal would hold them #
+
+def records_checksum(records):
+    return zlib.crc32("".join(encode_line(record) for record in records).encode())
+
+# Returns the record, False for a blank line, or None for a line that #
+# is torn (no newline), fails its checksum or does not parse. Lines   #
+# written before checksums were added start with "{" and are trusted. #
+
+def decode_line(line):
+    if not line.endswith(b"\n"):
+        return None
+
+    line = line.strip()
+    if not line:
+        return False
+
+    if line.startswith(b"{"):
+        text = line
+    else:
+        checksum, _, text = line.partition(b" ")
+        try:
+            if int(checksum, 16) != zlib.crc32(text):
+                return None
+        except ValueError:
+            return None
+
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+# entries maps transaction id -> entry. Records only ever set or #
+# remove whole values, so replaying one twice is harmless.        #
+
+def record_id(record):
+    if record["op"] != "add":
+        return record["id"]
+
+    data = record["entry"]
+    return data["id"] if isinstance(data, dict) else data[0]
+
+def records_by_id(records):
+    grouped = {}
+    for record in records:
+        grouped.setdefault(record_id(record), []).append(record)
+    return grouped
+
+def apply_record(entries, record):
+    op = record["op"]
+
+    if op == "add":
+        data = record["entry"]
+        if isinstance(data, dict):
+            entry = Transaction.from_dict(data)
+        else:
+            entry = Transaction.from_record(data)
+        entries[entry.id] = entry
+    elif op == "edit":
+        entry = entries.get(record["id"])
+        if entry is not None:
+            entry.cents = record["cents"] if "cents" in record else to_cents(record["amount"])
+            entry.category = record["category"]
+    elif op == "delete":
+        entries.pop(record["id"], None)
+
+## SNAPSHOT SUMMARY ##
+
+def month_of(micros):
+    return to_micros(month_bounds(from_micros(micros))[0])
+
+# (first of month, category) -> [count, cents] over entries, which #
+# come newest first, so the month is only worked out when it changes #
+
+def month_totals(entries):
+    totals = {}
+    start = end = None
+
+    for entry in entries:
+        if start is None or not start <= entry.micros < end:
+            month, next_month = month_bounds(from_micros(entry.micros))
+            start, end = to_micros(month), to_micros(next_month)
+
+        total = totals.setdefault((start, entry.category), [0, 0])
+        total[0] += 1
+        total[1] += entry.cents
+
+    return totals
+
+# The journal's records less those the snapshot already holds #
+
+def unfolded(header, records):
+    count, checksum = header.get("folded", (0, 0))
+    if count and records_checksum(records[:count]) == checksum:
+        return records[count:]
+    return records
+
+# The snapshot's month totals with the journal applied. Edits and      #
+# deletes carry the entry as it was before ("was"), so a change to an #
+# entry still in the snapshot is known without reading it; a record   #
+# written before that was added, or a snapshot without "months",      #
+# gives None.                                                         #
+
+def summarize(header, records):
+    if "months" not in header:
+        return None
+
+    months = {(month, category): [count, cents] for month, category, count, cents in header["months"]}
+    before = {}
+    after = {}
+
+    for record in records:
+        entry_id = record_id(record)
+        if entry_id < header["next_id"] and entry_id not in before:
+            if "was" not in record:
+                return None
+            micros, cents, category = record["was"]
+            before[entry_id] = Transaction(entry_id, cents, micros, category)
+            after[entry_id] = Transaction(entry_id, cents, micros, category)
+        apply_record(after, record)
+
+    for entries, sign in ((before, -1), (after, 1)):
+        for entry in entries.values():
+            total = months.setdefault((month_of(entry.micros), entry.category), [0, 0])
+            total[0] += sign
+            total[1] += sign * entry.cents
+
+    return {key: total for key, total in months.items() if total[0]}
+
+## SNAPSHOT WRITES ##
+
+# Write to a temporary file, fsync it, then rename it over the target, #
+# so a crash leaves either the old file or the new one, never a torn one. #
+
+def atomic_write(path, text):
+    temp_path = path + ".tmp"
+
+    with open(temp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, path)
+
+## JSON STORE ##
+
+# data.json format version 3: #
+#   {"version": 3, "next_id": N, "folded": [n, crc],                  #
+#    "months": [[month, category, count, cents], ...],                #
+#    "entries": [[id, micros, cents, category], ...]}                 #
+# with entries newest first, so the file can be streamed from the top #
+# and the first page shown before the rest has been parsed. "months"  #
+# totals the entries by the first of their month (in micros), so the  #
+# ledger's totals are whole from the first page; "folded" identifies  #
+# the journal records the snapshot already holds (see compact()).     #
+# Both were added later and may be missing.                           #
+# Version 1 (a plain list of dicts with float amounts and ISO strings) #
+# and version 2 (same as 3 but unordered, no next_id) are read whole  #
+# and rewritten as version 3 the first time they are loaded.          #
+
+class JsonStore:
+    lazy = False
+
+    def __init__(self, data_path=DATA_FILE, journal_path=JOURNAL_FILE):
+        self.data_path = data_path
+        self.journal = Journal(journal_path)
+
+        # Held while appending, and while compaction trims the journal #
+        self.lock = threading.Lock()
+
+        # (month, category) -> [count, cents] of every entry, set by #
+        # open_stream() when the snapshot and journal allow it       #
+        self.months = None
+        # Set when they did not, so the next write compacts (see maintain) #
+        self.outdated = False
+
+    def load(self):
+        next_id, chunks = self.open_stream()
+
+        entries = {}
+        for chunk in chunks:
+            for entry in chunk:
+                entries[entry.id] = entry
+        return entries
+
+    ## STREAMING - METHODS ##
+
+    # open_stream() returns (next_id, chunks): the id for the next new #
+    # entry, and an iterator of lists of entries, newest first, with    #
+    # the journal already applied.                                      #
+
+    def open_stream(self, chunk_size=STREAM_CHUNK):
+        snapshot = self.open_snapshot()
+        if snapshot is None:
+            return stream_entries(self.load_whole(), chunk_size)
+
+        f, buffer, pos, header = snapshot
+        records = unfolded(header, self.journal.records())
+        self.months = summarize(header, records)
+        self.outdated = self.months is None
+        journal = records_by_id(records)
+        next_id = max(header["next_id"], max(journal, default=0) + 1)
+
+        return next_id, self.stream_snapshot(f, buffer, pos, header["next_id"], journal, chunk_size)
+
+    # (open file, text read so far, position of the first entry, header) #
+    # for a version 3 data.json, or None for anything else               #
+
+    def open_snapshot(self):
+        try:
+            f = open(self.data_path, "r")
+        except FileNotFoundError:
+            return None
+
+        buffer = f.read(READ_BLOCK)
+        marker = buffer.find('"entries":[')
+        # A long "months" list can run past the first block #
+        while marker == -1 and buffer.startswith('{"version":'):
+            more = f.read(READ_BLOCK)
+            if not more:
+                break
+            buffer += more
+            marker = buffer.find('"entries":[')
+
+        header = None
+        if marker != -1:
+            try:
+                header = json.loads(buffer[:marker].rstrip().rstrip(",") + "}")
+            except json.JSONDecodeError:
+                pass
+
+        if header is None or header.get("version") != DATA_VERSION:
+            f.close()
+            return None
+        return f, buffer, marker + len('"entries":['), header
+
+    def stream_snapshot(self, f, buffer, pos, snapshot_next_id, journal, chunk_size):
+        with f:
+            # Ids from snapshot_next_id on were added after the snapshot, #
+            # so they are newer than anything in it and go first.          #
+            fresh = {}
+            for entry_id, records in journal.items():
+                if entry_id >= snapshot_next_id:
+                    for record in records:
+                        apply_record(fresh, record)
+
+            chunk = sorted(fresh.values(), key=lambda e: (e.micros, e.id), reverse=True)
+
+            for record in self.snapshot_records(f, buffer, pos):
+                entry = Transaction.from_record(record)
+
+                records = journal.get(entry.id)
+                if records:
+                    single = {entry.id: entry}
+                    for record in records:
+                        apply_record(single, record)
+                    entry = single.get(entry.id)
+                    if entry is None:
+                        continue
+
+                chunk.append(entry)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+
+            if chunk:
+                yield chunk
+
+    # Snapshots are only ever replaced whole (see atomic_write), so a #
+    # record that will not parse means the file itself was damaged.   #
+    # Keep a copy and carry on with what was read.                    #
+
+    def snapshot_records(self, f, buffer, pos):
+        try:
+            yield from iter_records(f, buffer, pos)
+        except json.JSONDecodeError as error:
+            log.error("%s is damaged (%s); loaded what came before it", self.data_path, error)
+            shutil.copyfile(self.data_path, self.data_path + ".corrupt")
+
+    def load_whole(self):
+        entries = {}
+        migrate = False
+
+        try:
+            with open(self.data_path, "r") as f:
+                content = f.read().strip()
+                if content:
+                    data = json.loads(content)
+
+                    if isinstance(data, list):
+                        # Entries saved before ids existed are numbered by position #
+                        for position, item in enumerate(data, start=1):
+                            entry = Transaction.from_dict(item, default_id=position)
+                            entries[entry.id] = entry
+                    elif data.get("version") in (2, DATA_VERSION):
+                        for record in data["entries"]:
+                            entry = Transaction.from_record(record)
+                            entries[entry.id] = entry
+                    else:
+                        raise ValueError(
+                            f"{self.data_path} has unsupported version {data.get('version')}"
+                        )
+                    migrate = True
+        except FileNotFoundError:
+            entries = {}
+        except json.JSONDecodeError as error:
+            # Moved aside rather than overwritten by the next snapshot #
+            log.error("%s is damaged (%s); moved to %s.corrupt", self.data_path, error, self.data_path)
+            os.replace(self.data_path, self.data_path + ".corrupt")
+            entries = {}
+
+        # Replay changes made since data.json was written #
+        records = self.journal.records()
+        for record in records:
+            apply_record(entries, record)
+
+        if migrate:
+            # The journal is folded into the new file, so it can go #
+            self.write_snapshot(entries, folded=records)
+            self.journal.clear()
+
+        return entries
+
+    # folded: the journal records already applied to entries #
+
+    def write_snapshot(self, entries, next_id=None, folded=()):
+        if next_id is None:
+            next_id = max(entries, default=0) + 1
+
+        newest_first = sorted(entries.values(), key=lambda e: (e.micros, e.id), reverse=True)
+
+        months = [
+            [month, category, count, cents]
+            for (month, category), (count, cents) in month_totals(newest_first).items()
+        ]
+
+        atomic_write(self.data_path, "".join([
+            f'{{"version":{DATA_VERSION},"next_id":{next_id},',
+            f'"folded":[{len(folded)},{records_checksum(folded)}],',
+            f'"months":{json.dumps(months, separators=(",", ":"))},"entries":[',
+            ",".join(json.dumps(entry.to_record(), separators=(",", ":")) for entry in newest_first),
+            "]}"
+        ]))
+
+    def apply(self, records):
+        with self.lock:
+            self.journal.append(records)
+
+    ## SUMMARY - METHODS ##
+
+    # As SegmentStore's, but None unless open_stream() could work them #
+    # out (see summarize)                                              #
+
+    def summary(self):
+        if self.months is None:
+            return None
+
+        totals = {}
+        for (month, category), (count, cents) in self.months.items():
+            total = totals.setdefault(category, [0, 0])
+            total[0] += count
+            total[1] += cents
+
+        return [(category, count, cents) for category, (count, cents) in totals.items()]
+
+    def month_summary(self):
+        return [
+            (from_micros(month), category, count, cents)
+            for (month, category), (count, cents) in self.months.items()
+        ]
+
+    ## COMPACTION - METHODS ##
+
+    # Called by the BackgroundWriter after it writes. Once the journal #
+    # is long enough, or open_stream() could not summarize it, the     #
+    # snapshot and journal are read back, written as a new snapshot,  #
+    # and the records folded into it are cut from the journal. The lock is only held to read and to cut the       #
+    # journal, so changes keep being appended while the snapshot is   #
+    # written. After a crash between the two steps the journal still  #
+    # starts with the folded records, which the snapshot's "folded"   #
+    # checksum picks out so they are skipped.                         #
+
+    def maintain(self):
+        if self.journal.count >= COMPACT_RECORDS or self.outdated:
+            self.compact()
+
+    def compact(self):
+        with self.lock:
+            records = self.journal.records()
+
+        entries = {}
+        next_id = 1
+        folded = records
+        snapshot = self.open_snapshot()
+        if snapshot is not None:
+            f, buffer, pos, header = snapshot
+            next_id = header["next_id"]
+            records = unfolded(header, records)
+            for chunk in self.stream_snapshot(f, buffer, pos, next_id, {}, STREAM_CHUNK):
+                for entry in chunk:
+                    entries[entry.id] = entry
+        elif os.path.exists(self.data_path):
+            # An older data.json not migrated yet; load() will do it #
+            return
+
+        for record in records:
+            apply_record(entries, record)
+            next_id = max(next_id, record_id(record) + 1)
+
+        self.write_snapshot(entries, next_id, folded)
+
+        with self.lock:
+            newer = self.journal.records()[len(folded):]
+            if newer:
+                self.journal.rewrite(newer)
+            else:
+                self.journal.clear()
+        self.outdated = False
+
+    def close(self):
+        pass
+
+## SQLITE STORE ##
+
+# One row per transaction, so every change is a single-row statement. #
+# The transaction id is the row id; timestamps are microseconds since #
+# EPOCH and amounts are integer cents, as in data.json.              #
+# PRAGMA user_version holds the schema version, and the meta table    #
+# whether data.json has been imported.                                #
+
+class SQLiteStore:
+    lazy = False
+
+    def __init__(self, path=DB_FILE, import_from=None):
+        # Store whose entries seed an empty database (default: JsonStore()) #
+        self.import_from = import_from
+
+        # Written from the BackgroundWriter thread, queried from the UI #
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+        (version,) = self.conn.execute("PRAGMA user_version").fetchone()
+        existing = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions'"
+        ).fetchone()
+        legacy = version < SCHEMA_VERSION and existing
+
+        with self.conn:
+            if legacy:
+                self.conn.execute("ALTER TABLE transactions RENAME TO transactions_v1")
+                self.conn.execute("DROP INDEX IF EXISTS idx_transactions_timestamp")
+                self.conn.execute("DROP INDEX IF EXISTS idx_transactions_category")
+
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS transactions ("
+                "id INTEGER PRIMARY KEY, "
+                "cents INTEGER NOT NULL, "
+                "micros INTEGER NOT NULL, "
+                "category TEXT)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transactions_micros "
+                "ON transactions (micros)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transactions_category "
+                "ON transactions (category, cents)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+            # Databases from before the meta table were imported when created #
+            if existing:
+                self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('imported', '1')")
+
+            if legacy:
+                # Schema version 1 stored REAL amounts and ISO timestamp text #
+                self.conn.executemany(
+                    "INSERT INTO transactions (id, cents, micros, category) VALUES (?, ?, ?, ?)",
+                    [
+                        (i, to_cents(a), to_micros(datetime.fromisoformat(t)), c)
+                        for i, a, t, c in self.conn.execute(
+                            "SELECT id, amount, timestamp, category FROM transactions_v1"
+                        ).fetchall()
+                    ]
+                )
+                self.conn.execute("DROP TABLE transactions_v1")
+
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def load(self):
+        self.import_once()
+
+        entries = {}
+
+        for entry_id, cents, micros, category in self.conn.execute(
+            "SELECT id, cents, micros, category FROM transactions ORDER BY id"
+        ):
+            entries[entry_id] = Transaction(entry_id, cents, micros, category)
+
+        return entries
+
+    # First run: bring over whatever the JSON store holds. Only once, #
+    # since an empty table later means every entry was deleted.      #
+
+    def import_once(self):
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone():
+            return
+
+        source = self.import_from if self.import_from is not None else JsonStore()
+        self.import_entries(source.load())
+
+    ## STREAMING - METHODS ##
+
+    # Same contract as JsonStore.open_stream(). Each chunk is its own #
+    # query continuing below the last (micros, id) seen, so entries   #
+    # added while streaming never show up twice.                      #
+
+    def open_stream(self, chunk_size=STREAM_CHUNK):
+        self.import_once()
+        (max_id,) = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()
+        return max_id + 1, self.stream_rows(chunk_size)
+
+    def stream_rows(self, chunk_size):
+        last = (2**63 - 1, 2**63 - 1)
+
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT id, cents, micros, category FROM transactions "
+                    "WHERE (micros, id) < (?, ?) ORDER BY micros DESC, id DESC LIMIT ?",
+                    (last[0], last[1], chunk_size)
+                ).fetchall()
+
+            if not rows:
+                return
+
+            last = (rows[-1][2], rows[-1][0])
+            yield [Transaction(*row) for row in rows]
+
+    def import_entries(self, entries):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO transactions (id, cents, micros, category) VALUES (?, ?, ?, ?)",
+                [(e.id, e.cents, e.micros, e.category) for e in entries.values()]
+            )
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('imported', '1')")
+
+    def apply(self, records):
+        # The whole batch is committed as one transaction #
+        with self.lock, self.conn:
+            for record in records:
+                op = record["op"]
+
+                if op == "add":
+                    entry_id, micros, cents, category = record["entry"]
+                    self.conn.execute(
+                        "INSERT INTO transactions (id, cents, micros, category) VALUES (?, ?, ?, ?)",
+                        (entry_id, cents, micros, category)
+                    )
+                elif op == "edit":
+                    self.conn.execute(
+                        "UPDATE transactions SET cents = ?, category = ? WHERE id = ?",
+                        (record["cents"], record["category"], record["id"])
+                    )
+                elif op == "delete":
+                    self.conn.execute(
+                        "DELETE FROM transactions WHERE id = ?",
+                        (record["id"],)
+                    )
+
+    def maintain(self):
+        # Every change is already a committed row; nothing to fold #
+        pass
+
+    # Entries are counted as they load instead (see Ledger.stream) #
+
+    def summary(self):
+        return None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+## BACKGROUND WRITER ##
+
+# Changes are queued here and written by a worker thread once no new #
+# change has arrived for WRITE_DELAY seconds, so a burst of edits     #
+# costs one write and the UI never waits on storage.                  #
+
+class BackgroundWriter(threading.Thread):
+    def __init__(self, store, delay=WRITE_DELAY):
+        super().__init__(daemon=True)
+        self.store = store
+        self.delay = delay
+        self.pending = []
+        self.queue_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = False
+
+    def submit(self, record):
+        with self.queue_lock:
+            self.pending.append(record)
+        self.wake.set()
+
+    def run(self):
+        while not self.stopping:
+            self.wake.wait()
+
+            # Debounce: keep waiting while changes are still arriving #
+            while not self.stopping:
+                self.wake.clear()
+                if not self.wake.wait(self.delay):
+                    break
+
+            try:
+                self.flush()
+            except (OSError, sqlite3.Error) as error:
+                log.warning("write failed, will retry: %s", error)
+                self.wake.wait(RETRY_DELAY)
+                self.wake.set()
+                continue
+
+            # Compaction runs here, never from flush() on the UI thread, #
+            # and without write_lock, so a flush() meanwhile (on_pause)   #
+            # does not wait for it                                        #
+            try:
+                self.store.maintain()
+            except OSError as error:
+                log.warning("compaction failed, will retry: %s", error)
+
+    # Records that fail to write go back in front of any queued since, #
+    # so the next flush retries them in order                           #
+
+    def flush(self):
+        with self.write_lock:
+            with self.queue_lock:
+                records, self.pending = self.pending, []
+            if not records:
+                return
+
+            try:
+                self.store.apply(records)
+            except BaseException:
+                with self.queue_lock:
+                    self.pending[:0] = records
+                raise
+
+    def stop(self):
+        self.stopping = True
+        self.wake.set()
+        self.join()
+        self.flush()
+
+## STREAM HELPERS ##
+
+def stream_entries(entries, chunk_size=STREAM_CHUNK):
+    newest_first = sorted(entries.values(), key=lambda e: (e.micros, e.id), reverse=True)
+    chunks = (
+        newest_first[i:i + chunk_size]
+        for i in range(0, len(newest_first), chunk_size)
+    )
+    return max(entries, default=0) + 1, chunks
+
+# Yields the records of a JSON array one at a time, reading f only as #
+# far as needed. buffer[pos:] is the text already read past the "[".  #
+
+def iter_records(f, buffer, pos):
+    decoder = json.JSONDecoder()
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+
+        if pos == len(buffer):
+            more = f.read(READ_BLOCK)
+            if not more:
+                return
+            buffer, pos = more, 0
+            continue
+
+        if buffer[pos] == "]":
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The record runs past what has been read so far #
+            more = f.read(READ_BLOCK)
+            if not more:
+                raise
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+
+        pos = end
+        yield record
+
+def open_store(backend=STORAGE_BACKEND):
+    if backend == "sqlite":
+        return SQLiteStore()
+    if backend == "segments":
+        from .segments import SegmentStore
+        return SegmentStore()
+    return JsonStore()
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+
+CATEGORIES = ["Food", "Bills", "Entertainment", "Subscriptions",
+              "Rent", "Insurance", "Savings", "Medicine", "Therapy",
+              "Credit Card", "Personal Care/Hygiene", "Other"]
+
+## CONVERSIONS ##
+
+# Timestamps are kept as microseconds since EPOCH and amounts as #
+# integer cents, so loading needs no date parsing and sums are exact. #
+
+def to_micros(timestamp):
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+def to_cents(amount):
+    return round(amount * 100)
+
+## TRANSACTION RECORD ##
+
+# One slotted object per transaction instead of a dict, which keeps #
+# large ledgers small in memory and makes field access cheaper.    #
+
+class Transaction:
+    __slots__ = ("id", "cents", "micros", "category")
+
+    def __init__(self, id, cents, micros, category=None):
+        self.id = id
+        self.cents = cents
+        self.micros = micros
+        self.category = category
+
+    @property
+    def amount(self):
+        return self.cents / 100
+
+    @property
+    def timestamp(self):
+        return from_micros(self.micros)
+
+    # On-disk form: [id, micros, cents, category] #
+
+    def to_record(self):
+        return [self.id, self.micros, self.cents, self.category]
+
+    @classmethod
+    def from_record(cls, record):
+        entry_id, micros, cents, category = record
+        return cls(entry_id, cents, micros, category)
+
+    # Version 1 form: {"amount": 1.5, "timestamp": "2026-01-15 18:07:45", ...} #
+
+    @classmethod
+    def from_dict(cls, data, default_id=None):
+        timestamp = data["timestamp"]
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+
+        # Version 1 saved edited entries without a category as "Uncategorized" #
+        category = data.get("category")
+        if category == "Uncategorized":
+            category = None
+
+        return cls(
+            data.get("id", default_id),
+            to_cents(data["amount"]),
+            to_micros(timestamp),
+            category
+        )
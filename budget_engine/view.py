@@ -0,0 +1,63 @@
+## ROW DATA ##
+
+# The RecycleView data for the transaction list, newest first. #
+
+def empty_rows(text="No entries yet."):
+    return [{
+        "timestamp_text": text,
+        "category_text": "",
+        "amount_text": "",
+        "entry_id": -1
+    }]
+
+def format_cents(cents):
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+def format_row(entry):
+    return {
+        "timestamp_text": entry.timestamp.strftime("%b %d, %I:%M %p"),
+        "category_text": entry.category or "Uncategorized",
+        "amount_text": f"${format_cents(entry.cents)}",
+        "entry_id": entry.id
+    }
+
+## ROW CACHE ##
+
+# Each entry's row is formatted once and reused by every refresh until #
+# the entry is edited or deleted, which forgets it.                    #
+
+class RowCache:
+    def __init__(self):
+        # Transaction id -> row #
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def row(self, entry):
+        row = self.rows.get(entry.id)
+        if row is None:
+            row = self.rows[entry.id] = format_row(entry)
+        return row
+
+    def forget(self, entry_id):
+        self.rows.pop(entry_id, None)
+
+# keys, if given, are time-order keys of the entries to show, such #
+# as Ledger.search() returns                                        #
+
+def build_rows(ledger, keys=None):
+    if keys is not None:
+        if not keys:
+            return empty_rows("No matching entries.")
+
+        row = ledger.rows.row
+        entries = ledger.entries
+        return [row(entries[-entry_id]) for micros, entry_id in keys]
+
+    if not ledger:
+        return empty_rows()
+
+    row = ledger.rows.row
+    return [row(entry) for entry in ledger.newest_first()]
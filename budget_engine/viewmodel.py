@@ -0,0 +1,50 @@
+import threading
+
+from .view import empty_rows, format_row
+
+## VIEW MODEL ##
+
+# The transaction list's rows and totals as of one ledger version.  #
+# compute_view() takes a cheap snapshot on the calling (UI) thread, #
+# builds the rows on a worker thread and hands the result to       #
+# deliver() from that thread. If the ledger changed meanwhile, its #
+# version no longer matches and the result should be thrown away.  #
+
+class ViewModel:
+    def __init__(self, version, rows, cents, count):
+        self.version = version
+        self.rows = rows
+        self.cents = cents
+        self.count = count
+
+# keys, if given, limit the rows to those entries (see build_rows) #
+
+def compute_view(ledger, deliver, keys=None):
+    version = ledger.version
+    keys = (ledger.time_order.keys if keys is None else keys)[:]
+    entries = ledger.entries
+    cached = ledger.rows.rows
+    cents = ledger.totals.cents
+    count = ledger.totals.count
+
+    def work():
+        rows = []
+        append = rows.append
+
+        # Only single dict lookups here, which are safe while the UI #
+        # thread changes the ledger; new rows are not cached, since  #
+        # an edit could land between formatting and storing one.     #
+        for micros, entry_id in keys:
+            row = cached.get(-entry_id)
+            if row is None:
+                entry = entries.get(-entry_id)
+                if entry is None:
+                    continue
+                row = format_row(entry)
+            append(row)
+
+        deliver(ViewModel(version, rows or empty_rows(), cents, count))
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+    return worker
@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from budget_engine import BudgetLimits, JsonStore, Ledger, budget_rows
+
+NOW = datetime(2026, 10, 18, 12)
+
+## BUDGET ROWS ##
+
+def test_budget_rows_add_up_to_month_total(tmp_path):
+    store = JsonStore(str(tmp_path / "data.json"), str(tmp_path / "data.journal"))
+    ledger = Ledger(store, background=False)
+    ledger.add(5, None, NOW)
+    ledger.add(10, None, NOW)
+    ledger.add(20, "Food", NOW)
+    ledger.add(40, "Food", datetime(2026, 9, 30))
+
+    rows = budget_rows(ledger, BudgetLimits(str(tmp_path / "budget.json")), NOW)
+    assert sum(spent for category, spent, limit in rows) == 3500
+    assert rows[-1] == (None, 1500, None)
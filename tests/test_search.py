@@ -0,0 +1,95 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from budget_engine import CATEGORIES, JsonStore, Ledger, Transaction, parse_query, to_micros
+from budget_engine import search
+
+NOW = datetime(2026, 10, 18, 12)
+
+QUERIES = [
+    "food", "food ent", "food ent mar", "s <2", "f e r i 2024", "unc",
+    "food >300", "food ent >100", "b s 2025-03 10-90", "20-50", "2025-03",
+    # Date words that do not overlap match nothing #
+    "food ent 2025-03 2025-05", "food rent 2026-01-05 2026-01-09",
+    "food rent january april", "food 2025-03 2025-05 >10", "zzz"
+]
+
+## HELPERS ##
+
+# A ledger of count entries over the two years before NOW, loaded from #
+# a snapshot the way the app loads one                                 #
+
+def make_ledger(tmp_path, count, seed):
+    rnd = random.Random(seed)
+    start = to_micros(NOW - timedelta(days=730))
+
+    entries = {}
+    for entry_id in range(1, count + 1):
+        entries[entry_id] = Transaction(
+            entry_id,
+            rnd.randrange(1, 50000),
+            start + rnd.randrange(730 * 86400) * 1000000,
+            rnd.choice(CATEGORIES + [None])
+        )
+
+    store = JsonStore(str(tmp_path / "data.json"), str(tmp_path / "data.journal"))
+    store.write_snapshot(entries, count + 1)
+    return Ledger(store, background=False).load()
+
+def brute_force(ledger, query):
+    return [key for key in ledger.time_order.keys if query.matches(ledger.entries[-key[1]])]
+
+def check(ledger):
+    for text in QUERIES:
+        query = parse_query(text, NOW)
+        assert ledger.search(query) == brute_force(ledger, query), text
+
+    # Bitmaps kept up to date by changes equal freshly built ones #
+    bitmaps = ledger.search_index.bitmaps
+    if bitmaps is not None:
+        ledger.search_index.bitmaps = None
+        assert ledger.search_index.category_bitmaps() == bitmaps
+
+## SEARCH ##
+
+# Every SCAN_ENTRIES also takes the amount-order path, at 0 #
+
+@pytest.mark.parametrize("scan_entries", [search.SCAN_ENTRIES, 0])
+def test_search_matches_brute_force(tmp_path, monkeypatch, scan_entries):
+    monkeypatch.setattr(search, "SCAN_ENTRIES", scan_entries)
+    ledger = make_ledger(tmp_path, 3000, seed=1)
+    check(ledger)
+
+    rnd = random.Random(2)
+    for step in range(300):
+        entry_ids = list(ledger.entries)
+        roll = rnd.random()
+        if roll < 0.4:
+            ledger.edit(rnd.choice(entry_ids), rnd.uniform(0.01, 500), rnd.choice(CATEGORIES + [None]))
+        elif roll < 0.7:
+            ledger.delete(rnd.choice(entry_ids))
+        else:
+            timestamp = NOW - timedelta(seconds=rnd.randrange(730 * 86400))
+            ledger.add(rnd.uniform(0.01, 500), rnd.choice(CATEGORIES + [None]), timestamp)
+
+        if step % 50 == 0:
+            check(ledger)
+    check(ledger)
+
+# Version 1 saved edited entries without a category as "Uncategorized" #
+
+def test_uncategorized_matches_version_1_text(tmp_path):
+    (tmp_path / "data.json").write_text(json.dumps([
+        {"amount": 5, "timestamp": "2026-10-18 12:00:00", "category": None},
+        {"amount": 10, "timestamp": "2026-10-18 12:00:00", "category": "Uncategorized"},
+        {"amount": 20, "timestamp": "2026-10-18 12:00:00", "category": "Food"}
+    ]))
+    store = JsonStore(str(tmp_path / "data.json"), str(tmp_path / "data.journal"))
+    ledger = Ledger(store, background=False).load()
+
+    keys = ledger.search(parse_query("uncategorized", NOW))
+    assert sorted(-entry_id for micros, entry_id in keys) == [1, 2]
+    assert ledger.get(2).category is None
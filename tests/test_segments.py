@@ -0,0 +1,84 @@
+import errno
+from datetime import datetime
+
+import pytest
+
+from budget_engine import JsonStore, SegmentStore, Transaction, to_micros
+from budget_engine import segments, storage
+
+MARCH = to_micros(datetime(2026, 3, 5, 12))
+
+## HELPERS ##
+
+# Called again over the same files, as on the next start #
+
+def make_store(tmp_path):
+    source = JsonStore(str(tmp_path / "data.json"), str(tmp_path / "data.journal"))
+    store = SegmentStore(str(tmp_path / "data"), import_from=source)
+    store.read_manifest()
+    return store
+
+def add(entry_id, cents, category, micros=MARCH):
+    return {"op": "add", "entry": Transaction(entry_id, cents, micros, category).to_record()}
+
+def fail_once(monkeypatch, module, name):
+    real = getattr(module, name)
+    calls = []
+
+    def failing(*args):
+        if not calls:
+            calls.append(args)
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return real(*args)
+    monkeypatch.setattr(module, name, failing)
+
+def streamed(store):
+    next_id, chunks = store.open_stream()
+    return {entry.id: entry for chunk in chunks for entry in chunk}
+
+## FAILED WRITES ##
+
+def test_failed_manifest_write_is_not_counted_twice(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    fail_once(monkeypatch, segments, "atomic_write")
+
+    with pytest.raises(OSError):
+        store.apply([add(1, 500, "Rent")])
+    store.apply([add(1, 500, "Rent")])
+
+    for opened in (store, make_store(tmp_path)):
+        assert opened.summary() == [("Rent", 1, 500)]
+        assert opened.next_id == 2
+
+def test_failed_delete_is_written_on_retry(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store.apply([add(1, 500, "Rent"), add(2, 700, "Bills")])
+
+    fail_once(monkeypatch, storage.os, "fsync")
+    with pytest.raises(OSError):
+        store.apply([{"op": "delete", "id": 1}])
+    store.apply([{"op": "delete", "id": 1}])
+
+    opened = make_store(tmp_path)
+    assert opened.summary() == [("Bills", 1, 700)]
+    assert list(streamed(opened)) == [2]
+
+## INTERRUPTED WRITES ##
+
+# As if the app died after appending to the month but before the #
+# manifest was written                                             #
+
+def test_crash_before_manifest_is_recovered(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store.apply([add(1, 500, "Rent")])
+
+    monkeypatch.setattr(segments, "atomic_write", lambda *args: None)
+    store.apply([add(2, 700, "Bills")])
+    monkeypatch.undo()
+
+    opened = make_store(tmp_path)
+    assert opened.next_id == 3
+    assert sorted(opened.summary()) == [("Bills", 1, 700), ("Rent", 1, 500)]
+
+    opened.apply([add(opened.next_id, 900, "Food")])
+    assert sorted(streamed(make_store(tmp_path))) == [1, 2, 3]
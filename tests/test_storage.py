@@ -0,0 +1,218 @@
+import errno
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from budget_engine import BackgroundWriter, JsonStore, Ledger, SQLiteStore, Transaction, to_micros
+from budget_engine import storage
+
+## HELPERS ##
+
+# A JsonStore whose first failures writes raise, as on a full disk #
+
+class FailingStore(JsonStore):
+    def __init__(self, tmp_path, failures):
+        super().__init__(str(tmp_path / "data.json"), str(tmp_path / "data.journal"))
+        self.failures = failures
+
+    def apply(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise OSError(errno.ENOSPC, "No space left on device")
+        super().apply(records)
+
+def record(entry_id):
+    return {"op": "delete", "id": entry_id}
+
+# count entries over four months, with changes since the snapshot in #
+# the journal: edits and deletes of old entries, and new entries      #
+
+def make_store(tmp_path, count=2000):
+    store = JsonStore(str(tmp_path / "data.json"), str(tmp_path / "data.journal"))
+    categories = ["Food", "Rent", None]
+    store.write_snapshot({
+        n: Transaction(n, n, to_micros(datetime(2026, 1 + n % 4, 1 + n % 28)), categories[n % 3])
+        for n in range(1, count + 1)
+    })
+
+    ledger = Ledger(store, background=False).load()
+    for n in range(1, count, 7):
+        ledger.edit(n, 1.5, "Bills")
+    for n in range(2, count, 11):
+        ledger.delete(n)
+    for n in range(20):
+        ledger.add(2, "Food", datetime(2026, 5, 1 + n))
+    return store
+
+def totals(ledger):
+    return ledger.totals.count, ledger.totals.cents, ledger.category_totals(), [
+        ledger.category_totals(datetime(2026, month, 1), datetime(2026, month + 1, 1))
+        for month in range(1, 6)
+    ]
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+## JOURNAL ##
+
+def test_failed_append_leaves_journal_unchanged(tmp_path, monkeypatch):
+    journal = storage.Journal(str(tmp_path / "data.journal"))
+    journal.append([record(1)])
+
+    def fail(fd):
+        raise OSError(errno.EIO, "Input/output error")
+    monkeypatch.setattr(storage.os, "fsync", fail)
+    with pytest.raises(OSError):
+        journal.append([record(2)])
+
+    monkeypatch.undo()
+    journal.append([record(3)])
+    assert journal.records() == [record(1), record(3)]
+
+## JSON STORE SUMMARY ##
+
+# Totals are whole before the first chunk is taken, and stay so #
+
+def test_totals_are_whole_while_streaming(tmp_path):
+    store = make_store(tmp_path)
+    loaded = totals(Ledger(store, background=False).load())
+
+    ledger = Ledger(store, background=False)
+    chunks = ledger.stream()
+    assert totals(ledger) == loaded
+    next(chunks)
+    assert totals(ledger) == loaded
+    for chunk in chunks:
+        pass
+    assert totals(ledger) == loaded
+
+    store.compact()
+    ledger = Ledger(store, background=False)
+    chunks = ledger.stream()
+    assert totals(ledger) == loaded
+
+def test_records_left_by_interrupted_compaction_count_once(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    loaded = totals(Ledger(store, background=False).load())
+
+    monkeypatch.setattr(store.journal, "clear", lambda: None)
+    store.compact()
+    monkeypatch.undo()
+    assert store.journal.count > 0
+
+    ledger = Ledger(store, background=False)
+    chunks = ledger.stream()
+    assert totals(ledger) == loaded
+    ledger.load()
+    assert totals(ledger) == loaded
+
+# Records written before edits and deletes carried "was" #
+
+def test_journal_without_was_counts_while_loading(tmp_path):
+    store = make_store(tmp_path, count=10)
+    store.apply([{"op": "delete", "id": 3}])
+    loaded = totals(Ledger(store, background=False).load())
+
+    ledger = Ledger(store, background=False)
+    ledger.stream()
+    assert store.summary() is None
+    assert ledger.totals.count == 0
+    ledger.load()
+    assert totals(ledger) == loaded
+
+    # The next write folds them into a snapshot that has a summary #
+    store.maintain()
+    ledger = Ledger(store, background=False)
+    ledger.stream()
+    assert totals(ledger) == loaded
+
+## SQLITE STORE ##
+
+def test_sqlite_imports_data_json_once(tmp_path):
+    source = JsonStore(str(tmp_path / "data.json"), str(tmp_path / "data.journal"))
+    source.write_snapshot({1: Transaction(1, 500, 0, "Rent"), 2: Transaction(2, 700, 0, None)})
+
+    def open_ledger():
+        return Ledger(SQLiteStore(str(tmp_path / "budget.db"), import_from=source), background=False).load()
+
+    ledger = open_ledger()
+    assert sorted(ledger.entries) == [1, 2]
+    for entry_id in [1, 2]:
+        ledger.delete(entry_id)
+    ledger.store.close()
+
+    assert len(open_ledger()) == 0
+
+## BACKGROUND WRITER ##
+
+def test_writer_retries_failed_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "RETRY_DELAY", 0.05)
+    store = FailingStore(tmp_path, failures=2)
+    writer = BackgroundWriter(store, delay=0.01)
+    writer.start()
+
+    writer.submit(record(1))
+    writer.submit(record(2))
+    assert wait_for(lambda: store.failures == 0)
+    writer.submit(record(3))
+
+    assert wait_for(lambda: not writer.pending)
+    assert writer.is_alive()
+    assert store.journal.records() == [record(1), record(2), record(3)]
+    writer.stop()
+
+def test_stop_keeps_records_that_fail(tmp_path):
+    store = FailingStore(tmp_path, failures=100)
+    writer = BackgroundWriter(store, delay=60)
+    writer.start()
+    writer.submit(record(1))
+
+    with pytest.raises(OSError):
+        writer.stop()
+    assert writer.pending == [record(1)]
+
+    store.failures = 0
+    writer.flush()
+    assert store.journal.records() == [record(1)]
+
+# Compaction runs without write_lock: a flush() while the snapshot is #
+# written goes straight to the journal, and is kept after the cut    #
+
+def test_flush_does_not_wait_for_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "COMPACT_RECORDS", 2)
+    store = JsonStore(str(tmp_path / "data.json"), str(tmp_path / "data.journal"))
+    entries = {n: Transaction(n, 100 * n, 0, "Rent") for n in range(1, 5)}
+    store.write_snapshot(entries, 5)
+
+    started = threading.Event()
+    release = threading.Event()
+    write_snapshot = store.write_snapshot
+
+    def slow_write_snapshot(*args):
+        started.set()
+        release.wait(5)
+        write_snapshot(*args)
+    store.write_snapshot = slow_write_snapshot
+
+    writer = BackgroundWriter(store, delay=0.01)
+    writer.start()
+    writer.submit(record(1))
+    writer.submit(record(2))
+    assert started.wait(5)
+
+    begun = time.monotonic()
+    writer.submit(record(3))
+    writer.flush()
+    assert time.monotonic() - begun < 1
+
+    release.set()
+    assert wait_for(lambda: store.journal.count == 1)
+    writer.stop()
+
+    assert store.journal.records() == [record(3)]
+    assert sorted(store.load()) == [4]